@@ -1,28 +1,55 @@
 from __future__ import annotations
 
 from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from jinja2 import Environment, FileSystemLoader, select_autoescape
+import asyncio
+import csv
+import datetime as dt
+import io
 import os
+from typing import Optional
 
-from src.metrics import summarize, tail
+from src.instrumentation import load_snapshot, render_prometheus
+from src.metrics import LogFollower, SummaryAggregator, log_line_matches, tail, window_counts
+from src.result_store import LOOKUP_PAGE_MAX, ResultStore
+from src.tracing import load_traces
 
 app = FastAPI(title="ParsingPhoneNumbers Admin")
+# Счётчики сводки ведутся в фоне; запросы к дашборду их только читают
+aggregator = SummaryAggregator()
+
+LOG_POLL_INTERVAL = 1  # как часто поток логов проверяет файл, секунды
+LOG_HEARTBEAT = 15  # комментарий-пинг для прокси, если новых строк нет, секунды
 
 TEMPLATES_DIR = os.path.join(os.path.dirname(__file__), "templates")
 os.makedirs(TEMPLATES_DIR, exist_ok=True)
 env = Environment(loader=FileSystemLoader(TEMPLATES_DIR), autoescape=select_autoescape())
 
 
+@app.on_event("startup")
+def start_aggregator():
+    aggregator.poll()
+    aggregator.start()
+
+
+@app.on_event("shutdown")
+def stop_aggregator():
+    aggregator.stop()
+
+
 @app.get("/health")
 def health():
     return {"status": "ok"}
 
 
 @app.get("/api/summary")
-def api_summary():
-    return JSONResponse(summarize())
+def api_summary(since: Optional[dt.datetime] = None, until: Optional[dt.datetime] = None):
+    """Сводка для дашборда; с параметром since — счётчики за окно [since, until)."""
+    if since is not None:
+        return JSONResponse(window_counts(since, until))
+    return JSONResponse(aggregator.summary())
 
 
 @app.get("/logs")
@@ -30,8 +57,97 @@ def logs(n: int = 200):
     return PlainTextResponse("".join(tail(n)))
 
 
+@app.get("/logs/stream")
+async def logs_stream(request: Request, n: int = 200, level: Optional[str] = None, session: Optional[str] = None):
+    """
+    Server-sent events: сначала последние n строк, затем только новые строки лога по мере появления.
+    level — минимальный уровень, session — имя сессии.
+    """
+
+    async def events():
+        follower = LogFollower(from_end=False)
+        # Хвост и начало слежения — один снимок файла: строки на стыке не дублируются
+        for line in follower.tail(n):
+            if log_line_matches(line, level, session):
+                yield f"data: {line.rstrip()}\n\n"
+
+        idle = 0.0
+        while not await request.is_disconnected():
+            lines = [line for line in follower.read_new() if log_line_matches(line, level, session)]
+            for line in lines:
+                yield f"data: {line.rstrip()}\n\n"
+            if lines:
+                idle = 0.0
+            elif idle >= LOG_HEARTBEAT:
+                yield ": ping\n\n"
+                idle = 0.0
+            await asyncio.sleep(LOG_POLL_INTERVAL)
+            idle += LOG_POLL_INTERVAL
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """Метрики бота в текстовом формате Prometheus (снимок, который бот сохраняет раз в несколько секунд)."""
+    return PlainTextResponse(render_prometheus(load_snapshot()), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/api/traces")
+def api_traces(n: int = 50):
+    """Последние n трасс строк (этапы с началом и концом, секунды от начала строки), новые первыми."""
+    data = load_traces() or {"updated_at": None, "traces": []}
+    return JSONResponse({"updated_at": data["updated_at"], "traces": data["traces"][:max(n, 0)]})
+
+
+@app.get("/api/lookup")
+def api_lookup(inn: Optional[str] = None, phone: Optional[str] = None, limit: int = 50, before: Optional[int] = None):
+    """
+    Что уже найдено по ИНН или телефону — из локальной базы результатов, без запросов к Google Sheets.
+    Новые результаты первыми; следующая страница — before=next из ответа.
+    """
+    if not inn and not phone:
+        return JSONResponse({"error": "укажите inn или phone"}, status_code=400)
+    limit = min(max(limit, 1), LOOKUP_PAGE_MAX)
+    store = ResultStore()
+    try:
+        total, items = store.find(inn=inn, phone=phone, limit=limit, before=before)
+    finally:
+        store.close()
+    next_before = items[-1]["id"] if items and len(items) == limit else None
+    return JSONResponse({"total": total, "items": items, "next": next_before})
+
+
+@app.get("/api/lookup/export")
+def api_lookup_export(inn: Optional[str] = None, phone: Optional[str] = None):
+    """Все совпадения (без параметров — вся база) в CSV; база читается страницами, ответ отдаётся потоком."""
+    fields = ["inn", "fio", "phones", "emails", "birthday", "session", "source", "created_at"]
+
+    def rows():
+        store = ResultStore()
+        try:
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(fields)
+            for item in store.iter_all(inn=inn or None, phone=phone or None):
+                writer.writerow([", ".join(value) if isinstance(value, list) else value for value in map(item.get, fields)])
+                if buffer.tell() > 64 * 1024:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+            yield buffer.getvalue()
+        finally:
+            store.close()
+
+    return StreamingResponse(
+        rows(),
+        media_type="text/csv; charset=utf-8",
+        headers={"Content-Disposition": 'attachment; filename="lookup.csv"'},
+    )
+
+
 @app.get("/", response_class=HTMLResponse)
 def dashboard(request: Request):
-    data = summarize()
+    data = aggregator.summary()
     tmpl = env.get_template("dashboard.html")
     return HTMLResponse(tmpl.render(data=data))
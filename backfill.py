@@ -0,0 +1,268 @@
+"""
+Разовая выгрузка большого списка ИНН без Google Sheets.
+
+Строки читаются по одной из CSV или JSONL, ищутся теми же функциями, что и в main.py (lookup_row),
+всеми сессиями с квотой, и сразу дописываются в файл результатов. Каждая запись хранит номер входной строки (offset),
+так что прерванный запуск можно повторить с теми же аргументами: готовые строки пропускаются.
+С --upload готовый файл целиком записывается на лист таблицы одним запросом.
+
+    python backfill.py inns.csv results.jsonl
+    python backfill.py inns.jsonl results.csv --upload "Выгрузка"
+"""
+import argparse
+import asyncio
+import csv
+import datetime as dt
+import json
+import os
+
+import gspread
+
+from typing import Iterator, List, Optional, Set, Tuple
+
+from src.client_pool import get_client_pool
+from src.google_sheets import LookupResult, get_table, lookup_row
+from src.instrumentation import ROWS
+from src.metrics import PROCESSED
+from src.result_cache import normalize_inn
+from src.result_store import get_result_store
+from src.scheduler import get_scheduler
+from src.sheets_io import READ, WRITE, AsyncWorksheet, get_governor
+from src.utils import logger
+
+BOT_USERNAME = "@UssboxBot"
+QUEUE_SIZE = 100  # столько входных строк держим в памяти наперёд
+RESULT_FIELDS = ["offset", "inn", "fio", "phones", "emails", "birthday", "session", "processed_at"]
+UPLOAD_FIELDS = ["inn", "fio", "phones", "emails", "birthday"]
+
+InputRow = Tuple[int, str, str]  # offset, ФИО, ИНН
+
+
+def _format_of(path: str, fmt: Optional[str]) -> str:
+    fmt = fmt or os.path.splitext(path)[1].lstrip(".").lower()
+    if fmt not in ("csv", "jsonl"):
+        raise SystemExit(f"Не удалось определить формат {path}: укажите csv или jsonl")
+    return fmt
+
+
+def read_rows(path: str, fmt: str, fio_column: str, inn_column: str) -> Iterator[InputRow]:
+    """Входные строки по одной; offset — номер записи в файле, начиная с 0 (без заголовка CSV)."""
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        if fmt == "csv":
+            records = csv.DictReader(f)
+        else:
+            records = (json.loads(line) if line.strip() else {} for line in f)
+
+        for offset, record in enumerate(records):
+            inn = str(record.get(inn_column) or "").strip()
+            if not inn:
+                logger.warning(f"Строка {offset}: нет ИНН, пропускаем")
+                continue
+            yield offset, str(record.get(fio_column) or "").strip(), inn
+
+
+class ResultSink:
+    """Файл результатов, в который записи только дописываются; каждая запись сразу сбрасывается на диск."""
+
+    def __init__(self, path: str, fmt: str):
+        self.path = path
+        self.fmt = fmt
+        self._file = None
+        self._writer = None
+
+    def records(self) -> Iterator[dict]:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8", newline="") as f:
+            if self.fmt == "csv":
+                yield from csv.DictReader(f)
+                return
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # Последняя строка могла оборваться при аварийной остановке
+                    logger.warning(f"Повреждённая запись в {self.path} пропущена")
+
+    def done_offsets(self) -> Set[int]:
+        return {int(record["offset"]) for record in self.records() if record.get("offset") not in (None, "")}
+
+    def open(self) -> None:
+        new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        self._file = open(self.path, "a", encoding="utf-8", newline="")
+        if self.fmt == "csv":
+            self._writer = csv.DictWriter(self._file, fieldnames=RESULT_FIELDS)
+            if new_file:
+                self._writer.writeheader()
+
+    def write(self, record: dict) -> None:
+        if self.fmt == "csv":
+            self._writer.writerow(record)
+        else:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class Backfill:
+    def __init__(self, rows: Iterator[InputRow], sink: ResultSink, max_rows: Optional[int] = None):
+        self.rows = rows
+        self.sink = sink
+        self.max_rows = max_rows
+        self.queue: "asyncio.Queue[Optional[InputRow]]" = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.done: Set[int] = set()
+        self.queued: Set[int] = set()  # строки, поставленные в очередь этим запуском
+        self.written = 0
+        self.failed = 0
+        self.input_finished = False
+
+    async def run(self) -> bool:
+        """Обрабатывает все входные строки; True, если в файле результатов есть ответ на каждую."""
+        scheduler = get_scheduler()
+        scheduler.reload()
+        sessions = scheduler.available_sessions()
+        if not sessions:
+            logger.info(f"У всех сессий исчерпана квота до {scheduler.next_reset():%Y-%m-%d %H:%M}")
+            return False
+
+        self.done = self.sink.done_offsets()
+        if self.done:
+            logger.info(f"Продолжение: в {self.sink.path} уже {len(self.done)} строк")
+
+        self.sink.open()
+        pool = get_client_pool()
+        reader = asyncio.create_task(self._read(len(sessions)))
+        try:
+            await asyncio.gather(*(self._work(session_name, items) for session_name, items in sessions))
+        finally:
+            reader.cancel()
+            self.sink.close()
+            scheduler.flush()
+            await pool.close()
+
+        left = len(self.queued - self.done)
+        logger.info(
+            f"Записано строк: {self.written}, ошибок: {self.failed}, "
+            f"всего готово {len(self.done)}" + ("" if self.input_finished else "; вход прочитан не до конца")
+        )
+        if left:
+            logger.info(f"Не обработано {left} строк, их возьмёт следующий запуск")
+        return self.input_finished and not left
+
+    async def _read(self, workers: int) -> None:
+        for row in self.rows:
+            if row[0] in self.done:
+                continue
+            if self.max_rows is not None and len(self.queued) >= self.max_rows:
+                # Нашлась необработанная строка сверх --max-rows: вход прочитан не до конца
+                break
+            await self.queue.put(row)
+            self.queued.add(row[0])
+        else:
+            self.input_finished = True
+        for _ in range(workers):
+            await self.queue.put(None)
+
+    async def _work(self, session_name: str, items: list) -> None:
+        with logger.contextualize(session=session_name):
+            scheduler = get_scheduler()
+            pool = get_client_pool()
+            try:
+                client = await pool.get(session_name, items)
+                chat = await pool.resolve(session_name, client, BOT_USERNAME)
+            except Exception as e:
+                logger.exception(e)
+                return
+
+            while scheduler.has_quota(session_name):
+                row = await self.queue.get()
+                if row is None:
+                    return
+                offset, fio, inn = row
+                try:
+                    result = await lookup_row(client, chat, fio, inn)
+                except ConnectionError as e:
+                    logger.error(f"Сессия {session_name} остановлена: нет соединения с Telegram ({e}); строка {offset} останется на следующий запуск")
+                    return
+                except Exception:
+                    # Строка не записана в файл — её повторит следующий запуск
+                    logger.exception(f"Ошибка при обработке строки {offset} (ИНН {inn})")
+                    self.failed += 1
+                    continue
+
+                if not isinstance(result, LookupResult):
+                    logger.error(f"Сессия {session_name} остановлена: {result}; строка {offset} останется на следующий запуск")
+                    return
+                self._write(offset, fio, inn, result, session_name)
+
+            logger.info(f"Сессия {session_name}: исчерпана суточная квота")
+
+    def _write(self, offset: int, fio: str, inn: str, result: LookupResult, session_name: str) -> None:
+        self.sink.write({
+            "offset": offset,
+            "inn": normalize_inn(inn),
+            "fio": fio,
+            "phones": result.phones,
+            "emails": result.emails,
+            "birthday": result.birthday or "",
+            "session": session_name,
+            "processed_at": dt.datetime.now().isoformat(timespec="seconds"),
+        })
+        get_result_store().add(inn, fio, result.phones, result.emails, result.birthday, session_name, "backfill")
+        self.done.add(offset)
+        self.written += 1
+        ROWS.inc(session=session_name, result=PROCESSED)
+        if self.written % 100 == 0:
+            logger.info(f"Записано строк: {self.written}")
+
+
+async def upload(sink: ResultSink, worksheet: str) -> None:
+    """Записывает готовый файл на лист worksheet (создаёт его при необходимости) одним запросом update."""
+    # Если строка записана дважды (остановка между записью и выходом), берём последний ответ
+    records = [record for _, record in sorted({int(r["offset"]): r for r in sink.records()}.items())]
+    values: List[list] = [UPLOAD_FIELDS] + [[record.get(field) or "" for field in UPLOAD_FIELDS] for record in records]
+
+    # Как и запросы AsyncWorksheet, подготовка листа идёт через общий бюджет квоты с повторами после 429/5xx
+    governor = get_governor()
+    table = await governor.call(READ, get_table)
+    try:
+        wks = await governor.call(READ, table.worksheet, worksheet)
+    except gspread.WorksheetNotFound:
+        wks = await governor.call(WRITE, table.add_worksheet, worksheet, rows=len(values), cols=len(UPLOAD_FIELDS))
+    else:
+        if wks.row_count < len(values):
+            await governor.call(WRITE, wks.resize, rows=len(values))
+
+    await AsyncWorksheet(wks).update(values, "A1")
+    logger.info(f"На лист {worksheet} загружено строк: {len(records)}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Выгрузка телефонов и email по списку ИНН в файл")
+    parser.add_argument("input", help="CSV с заголовком или JSONL")
+    parser.add_argument("output", help="файл результатов (CSV или JSONL), дописывается")
+    parser.add_argument("--input-format", choices=["csv", "jsonl"])
+    parser.add_argument("--output-format", choices=["csv", "jsonl"])
+    parser.add_argument("--inn-column", default="inn")
+    parser.add_argument("--fio-column", default="fio")
+    parser.add_argument("--max-rows", type=int, help="обработать не больше строк за этот запуск")
+    parser.add_argument("--upload", metavar="WORKSHEET", help="после обработки всех строк записать результат на этот лист")
+    args = parser.parse_args()
+
+    rows = read_rows(args.input, _format_of(args.input, args.input_format), args.fio_column, args.inn_column)
+    sink = ResultSink(args.output, _format_of(args.output, args.output_format))
+    complete = await Backfill(rows, sink, args.max_rows).run()
+
+    if args.upload:
+        if complete:
+            await upload(sink, args.upload)
+        else:
+            logger.info("Обработаны не все строки, загрузка на лист отложена до следующего запуска")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
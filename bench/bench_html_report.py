@@ -0,0 +1,169 @@
+"""
+Сравнение потокового разбора HTML-отчёта (src/html_report.py) с прежним разбором через BeautifulSoup
+на синтетических отчётах разного размера.
+
+    python bench/bench_html_report.py [--cards 200 2000 10000] [--repeat 3]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.html_report import EMAIL_PATTERN, PHONE_PATTERN, get_phone_numbers_and_birthdate_from_html  # noqa: E402
+
+TARGET_FIO = "Иванов Иван Иванович"
+SURNAMES = ["Петров", "Сидоров", "Кузнецов", "Смирнов", "Попов", "Васильев"]
+NAMES = ["Пётр", "Сергей", "Алексей", "Дмитрий", "Николай"]
+PATRONYMICS = ["Петрович", "Сергеевич", "Алексеевич", "Дмитриевич"]
+
+
+def legacy_parse(target_fullname: str, html_file_name: str):
+    """Прежняя реализация на BeautifulSoup — эталон для сравнения."""
+    target_fullname_norm = re.sub(r'\s+', ' ', target_fullname.lower().strip())
+
+    with open(html_file_name, "r", encoding="utf-8") as file:
+        soup = BeautifulSoup(file, "html.parser")
+
+    phones = set()
+    emails = set()
+    birth_date = None
+
+    for card in soup.find_all("div", class_="card"):
+        fio_parts = {"фамилия": "", "имя": "", "отчество": ""}
+        full_name = ""
+
+        for row in card.find_all("div", class_="row"):
+            left = row.find("div", class_="row_left")
+            right = row.find("div", class_="row_right")
+            if not left or not right:
+                continue
+
+            label = left.text.strip().lower()
+            value = right.text.strip()
+
+            if "фио" in label:
+                full_name = value
+            elif "фамилия" in label:
+                fio_parts["фамилия"] = value
+            elif "имя" in label and "отчество" not in label:
+                fio_parts["имя"] = value
+            elif "отчество" in label:
+                fio_parts["отчество"] = value
+
+        if not full_name:
+            full_name = " ".join(fio_parts.values()).strip()
+
+        full_name_norm = re.sub(r'\s+', ' ', full_name.lower().strip())
+
+        if target_fullname_norm in full_name_norm:
+            for row in card.find_all("div", class_="row"):
+                left = row.find("div", class_="row_left")
+                right = row.find("div", class_="row_right")
+                if not left or not right:
+                    continue
+
+                label = left.text.strip().lower()
+                value = right.text.strip()
+
+                if "телефон" in label:
+                    for phone in re.split(r"[,\s]+", value):
+                        phone = phone.strip()
+                        if PHONE_PATTERN.fullmatch(phone):
+                            phones.add(phone)
+                elif ("email" in label) or ("e-mail" in label) or ("электрон" in label and "почт" in label):
+                    for email in EMAIL_PATTERN.findall(value):
+                        emails.add(email)
+                elif "дата рождения" in label and not birth_date:
+                    birth_date = value
+
+            block_text = card.get_text(" ")
+            for email in EMAIL_PATTERN.findall(block_text):
+                emails.add(email)
+
+    return {
+        "phones": list(phones),
+        "emails": list(emails),
+        "birthday": birth_date,
+    }
+
+
+def _row(label: str, value: str) -> str:
+    return f'<div class="row"><div class="row_left">{label}</div><div class="row_right">{value}</div></div>\n'
+
+
+def generate_report(path: str, cards: int, seed: int = 1) -> None:
+    rnd = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("<html><head><meta charset='utf-8'><style>.card{margin:4px}</style></head><body>\n")
+        for i in range(cards):
+            match = i % 25 == 0
+            f.write('<div class="card">\n<div class="card_title">Источник &laquo;база ' + str(i) + '&raquo;</div>\n')
+            if match and i % 2:
+                f.write(_row("ФИО", TARGET_FIO.upper()))
+            elif match:
+                f.write(_row("Фамилия", "Иванов") + _row("Имя", "Иван") + _row("Отчество", "Иванович"))
+            else:
+                f.write(_row("ФИО", f"{rnd.choice(SURNAMES)} {rnd.choice(NAMES)} {rnd.choice(PATRONYMICS)}"))
+            f.write(_row("Дата рождения", f"{rnd.randint(1, 28):02d}.{rnd.randint(1, 12):02d}.19{rnd.randint(50, 99)}"))
+            phones = ", ".join(f"+7{rnd.randint(9000000000, 9999999999)}" for _ in range(rnd.randint(1, 3)))
+            f.write(_row("Телефон", phones))
+            f.write(_row("Email", f"user{i}@mail.ru"))
+            f.write(_row("Адрес", "г. Москва, ул. Ленина, д. " + str(i) + " <b>кв.</b> " + str(rnd.randint(1, 300))))
+            f.write(f'<div class="note">Контакт: info{i}@example.com<br/>обновлено {rnd.randint(2010, 2024)}</div>\n')
+            f.write("</div>\n")
+        f.write("</body></html>\n")
+
+
+def _normalized(result: dict) -> tuple:
+    return sorted(result["phones"]), sorted(result["emails"]), result["birthday"]
+
+
+def measure(func, path: str, repeat: int):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(TARGET_FIO, path)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    func(TARGET_FIO, path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cards", type=int, nargs="+", default=[200, 2000, 10000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'cards':>7} {'size, KB':>9} | {'bs4, ms':>9} {'peak, MB':>9} | {'stream, ms':>10} {'peak, MB':>9} | {'speedup':>7}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for cards in args.cards:
+            path = os.path.join(tmp, f"report_{cards}.html")
+            generate_report(path, cards)
+            size_kb = os.path.getsize(path) / 1024
+
+            legacy_result, legacy_time, legacy_peak = measure(legacy_parse, path, args.repeat)
+            stream_result, stream_time, stream_peak = measure(get_phone_numbers_and_birthdate_from_html, path, args.repeat)
+            if _normalized(legacy_result) != _normalized(stream_result):
+                raise SystemExit(f"Результаты разбора отличаются на отчёте из {cards} карточек")
+
+            print(
+                f"{cards:>7} {size_kb:>9.0f} | {legacy_time * 1000:>9.1f} {legacy_peak / 2**20:>9.1f} | "
+                f"{stream_time * 1000:>10.1f} {stream_peak / 2**20:>9.1f} | {legacy_time / stream_time:>6.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
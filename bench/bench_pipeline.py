@@ -0,0 +1,381 @@
+"""
+Сквозной замер обработки строк (update_phones) без Telegram и Google Sheets:
+бот и лист подменяются локальными заглушками с настраиваемыми задержками.
+
+    python bench/bench_pipeline.py [--rows 200] [--sessions 1] [--latency 0.05] [--sheet-latency 0]
+                                   [--html-share 0.3] [--not-found-share 0.2] [--limit-after 0] [--duplicate-share 0] [--json]
+
+Показывает строк в секунду, вызовы API на строку, p50/p95 времени обработки строки, задержки цикла событий
+(насколько позже срабатывает таймер на LOOP_PROBE_INTERVAL секунд — столько же ждали бы сеть Telethon) и пиковую память процесса
+(RSS, включая процессы разбора отчётов; с --tracemalloc — пик Python-аллокаций основного процесса, но медленнее).
+Паузы ограничителя скорости (src/pacing.py) отключены: замеряется сам конвейер, а не темп, который разрешает бот.
+"""
+import argparse
+import asyncio
+import datetime as dt
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from collections import Counter
+from types import SimpleNamespace
+from typing import List, Optional, Tuple
+
+from gspread.utils import a1_range_to_grid_range
+from telethon import events
+from telethon.tl.types import MessageMediaDocument
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from bench_html_report import TARGET_FIO, generate_report  # noqa: E402
+
+CHAT = "@bench_bot"
+LOOP_PROBE_INTERVAL = 0.01
+Reply = Tuple[str, Optional[bytes]]  # текст сообщения и HTML-документ, если он есть
+
+
+class FakeWorksheet:
+    """Лист в памяти с теми методами gspread.Worksheet, которые использует конвейер."""
+
+    def __init__(self, rows: List[List[str]], latency: float, calls: Counter):
+        self.rows = rows
+        self.latency = latency
+        self.calls = calls
+
+    @property
+    def row_count(self) -> int:
+        return max(len(self.rows), 1000)
+
+    def col_values(self, col: int) -> List[str]:
+        self._call("col_values")
+        values = [row[col - 1] if col <= len(row) else "" for row in self.rows]
+        while values and not values[-1]:
+            values.pop()
+        return values
+
+    def cell(self, row: int, col: int):
+        self._call("cell")
+        values = self.rows[row - 1] if row <= len(self.rows) else []
+        return SimpleNamespace(value=values[col - 1] if col <= len(values) else "")
+
+    def update_cell(self, row: int, col: int, value) -> None:
+        self._call("update_cell")
+        self._set(row, col, value)
+
+    def get(self, range_name: str) -> List[List[str]]:
+        self._call("get")
+        grid = a1_range_to_grid_range(range_name)
+        out = []
+        for values in self.rows[grid["startRowIndex"]:grid["endRowIndex"]]:
+            values = values[grid["startColumnIndex"]:grid["endColumnIndex"]]
+            while values and not values[-1]:
+                values = values[:-1]
+            out.append(values)
+        while out and not out[-1]:
+            out.pop()
+        return out
+
+    def batch_update(self, data: List[dict], **kwargs) -> None:
+        self._call("batch_update")
+        for item in data:
+            grid = a1_range_to_grid_range(item["range"])
+            for i, values in enumerate(item["values"]):
+                for j, value in enumerate(values):
+                    self._set(grid["startRowIndex"] + 1 + i, grid["startColumnIndex"] + 1 + j, value)
+
+    def _call(self, name: str) -> None:
+        self.calls[f"sheets.{name}"] += 1
+        if self.latency:
+            # Как и настоящий запрос gspread, задержка блокирует поток, в котором выполняется вызов
+            time.sleep(self.latency)
+
+    def _set(self, row: int, col: int, value) -> None:
+        while len(self.rows) < row:
+            self.rows.append([])
+        values = self.rows[row - 1]
+        while len(values) < col:
+            values.append("")
+        values[col - 1] = value
+
+
+class FakeTable:
+    def __init__(self, wks: FakeWorksheet):
+        self.wks = wks
+
+    def worksheet(self, name: str) -> FakeWorksheet:
+        return self.wks
+
+
+class FakeBot:
+    """Ответы бота: по ИНН — текст с телефонами и датой рождения, иногда HTML-отчёт, «ничего не найдено» или лимит."""
+
+    def __init__(
+        self,
+        latency: float,
+        html_share: float,
+        not_found_share: float,
+        limit_after: int,
+        report: bytes,
+        seed: int,
+    ):
+        self.latency = latency
+        self.html_share = html_share
+        self.not_found_share = not_found_share
+        self.limit_after = limit_after
+        self.report = report
+        self.seed = seed
+
+    def delay(self) -> float:
+        return self.latency * random.uniform(0.5, 1.5)
+
+    def reply(self, text: str, request_no: int) -> List[Reply]:
+        if self.limit_after and request_no > self.limit_after:
+            return [("Вы исчерпали дневной лимит запросов, попробуйте завтра", None)]
+
+        rnd = random.Random(f"{self.seed}:{text}")
+        phones = "\n".join(f"├ Телефон: +7{rnd.randint(9000000000, 9999999999)}" for _ in range(rnd.randint(1, 3)))
+        if not text.startswith("/raw "):
+            return [(f"Результаты по запросу {text}\n{phones}", None)]
+
+        draw = rnd.random()
+        if draw < self.not_found_share:
+            return [("По вашему запросу ничего не найдено", None)]
+        birthday = f"{rnd.randint(1, 28):02d}.{rnd.randint(1, 12):02d}.19{rnd.randint(50, 99)}"
+        summary = f"ИНН {text[5:]}\n{phones}\n├ Email: user{rnd.randint(1, 10**6)}@mail.ru\n└ Дата рождения: {birthday}"
+        if draw < self.not_found_share + self.html_share:
+            return [(summary, None), ("", self.report)]
+        return [(summary, None)]
+
+
+class FakeFile:
+    def __init__(self, size: int):
+        self.name = "report.html"
+        self.mime_type = "text/html"
+        self.size = size
+
+
+class FakeMessage:
+    def __init__(self, client: "FakeBotClient", message_id: int, text: str, document: Optional[bytes] = None):
+        self.id = message_id
+        self.message = text
+        self.media = MessageMediaDocument() if document is not None else None
+        self.file = FakeFile(len(document)) if document is not None else None
+        self._client = client
+        self._document = document
+
+    async def download_media(self, file=None):
+        self._client.calls["telegram.download_media"] += 1
+        await asyncio.sleep(self._client.bot.delay() / 2)
+        if file is bytes:
+            return self._document
+        path = os.path.join(file, self.file.name)
+        with open(path, "wb") as f:
+            f.write(self._document)
+        return path
+
+
+class FakeBotClient:
+    """Заменяет TelegramClient: отвечает на send_message через зарегистрированные обработчики NewMessage."""
+
+    def __init__(self, session_name: str, bot: FakeBot, calls: Counter):
+        self.session = SimpleNamespace(filename=f"{session_name}.session")
+        self.bot = bot
+        self.calls = calls
+        self.history: List[FakeMessage] = []
+        self.requests = 0
+        self._handlers = []
+
+    def add_event_handler(self, callback, event=None) -> None:
+        # MessageEdited — подкласс NewMessage; бот-заглушка сообщения не правит
+        if type(event) is events.NewMessage:
+            self._handlers.append(callback)
+
+    def is_connected(self) -> bool:
+        return True
+
+    async def connect(self) -> None:
+        self.calls["telegram.connect"] += 1
+
+    async def send_message(self, chat, text: str) -> FakeMessage:
+        self.calls["telegram.send_message"] += 1
+        self.requests += 1
+        sent = self._new_message(text)
+        asyncio.get_running_loop().create_task(self._deliver(self.bot.reply(text, self.requests)))
+        return sent
+
+    async def get_messages(self, chat, limit: int) -> List[FakeMessage]:
+        self.calls["telegram.get_messages"] += 1
+        return list(reversed(self.history[-limit:]))
+
+    async def _deliver(self, replies: List[Reply]) -> None:
+        for text, document in replies:
+            await asyncio.sleep(self.bot.delay())
+            event = SimpleNamespace(message=self._new_message(text, document))
+            for handler in self._handlers:
+                await handler(event)
+
+    def _new_message(self, text: str, document: Optional[bytes] = None) -> FakeMessage:
+        message = FakeMessage(self, len(self.history) + 1, text, document)
+        self.history.append(message)
+        return message
+
+
+async def _probe_loop(lags: List[float]) -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(LOOP_PROBE_INTERVAL)
+        lags.append(max(loop.time() - start - LOOP_PROBE_INTERVAL, 0.0))
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q * len(ordered)) - 1))]
+
+
+async def run_pipeline(args, report: bytes, calls: Counter) -> Tuple[List[float], List[float], FakeWorksheet]:
+    # Модули src пишут базы и логи относительно текущей папки, поэтому импортируются уже во временной
+    from src import bot_replies, lookup_strategy, pacing, report_parsing
+    from src import google_sheets as gs
+
+    pacing.INITIAL_RATE = pacing.MAX_RATE = 10 ** 9
+    report_parsing.PARSE_EXECUTOR = args.parse_executor
+    lookup_strategy.FIO_DR_STRATEGY = args.fio_dr_strategy
+
+    rows = [["", "", "ФИО", "ИНН", "", "Телефон", "Email"]]
+    rnd = random.Random(args.seed)
+    inns: List[str] = []
+    for i in range(args.rows):
+        # Часть строк повторяет ИНН одной из предыдущих (одна компания — несколько договоров)
+        inns.append(rnd.choice(inns) if inns and rnd.random() < args.duplicate_share else str(7700000000 + i))
+    rows += [["", "", TARGET_FIO, inn, "", "", ""] for inn in inns]
+    wks = FakeWorksheet(rows, args.sheet_latency, calls)
+    gs.table = FakeTable(wks)
+
+    latencies: List[float] = []
+    process_row = gs.process_row
+
+    async def timed_process_row(*a, **kw):
+        start = time.perf_counter()
+        try:
+            return await process_row(*a, **kw)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    gs.process_row = timed_process_row
+
+    bot = FakeBot(args.latency, args.html_share, args.not_found_share, args.limit_after, report, args.seed)
+    clients = []
+    for i in range(args.sessions):
+        client = FakeBotClient(f"bench{i + 1}", bot, calls)
+        # Сборщик ответов с коротким ожиданием: иначе каждый ответ без документа ждёт REPLY_SETTLE секунд
+        bot_replies._collectors[client] = bot_replies.ReplyCollector(
+            client, CHAT, is_final=gs._is_final_reply, settle=args.settle
+        )
+        clients.append(client)
+
+    index = gs.build_pending_index()
+    sheet = await gs.get_worksheet()
+    writer = gs.build_writer(sheet, index)
+    writer.start()
+    row_queue = await gs.build_row_queue(index, sheet, writer)
+    lags: List[float] = []
+    probe = asyncio.create_task(_probe_loop(lags))
+    try:
+        await asyncio.gather(*(
+            gs.update_phones(CHAT, client, session_name=client.session.filename[:-8], row_queue=row_queue, writer=writer)
+            for client in clients
+        ))
+    finally:
+        probe.cancel()
+        await writer.close()
+        report_parsing.shutdown()
+    return latencies, lags, wks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--sessions", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.05, help="задержка каждого сообщения бота, секунды")
+    parser.add_argument("--sheet-latency", type=float, default=0.0, help="задержка каждого вызова листа, секунды")
+    parser.add_argument("--settle", type=float, default=0.2, help="ожидание после нефинального ответа, секунды")
+    parser.add_argument("--html-share", type=float, default=0.3, help="доля ответов по ИНН с HTML-отчётом")
+    parser.add_argument("--not-found-share", type=float, default=0.2, help="доля ответов «ничего не найдено»")
+    parser.add_argument("--duplicate-share", type=float, default=0.0, help="доля строк с уже встречавшимся ИНН")
+    parser.add_argument("--limit-after", type=int, default=0, help="после стольких запросов сессия получает лимит")
+    parser.add_argument("--report-cards", type=int, default=200, help="размер HTML-отчёта в карточках")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--fio-dr-strategy", choices=("always", "if_no_phones", "adaptive"), default="always")
+    parser.add_argument("--parse-executor", choices=("process", "thread", "inline"), default="process")
+    parser.add_argument("--tracemalloc", action="store_true", help="мерить пик памяти через tracemalloc")
+    parser.add_argument("--json", action="store_true", help="вывести результат одной строкой JSON")
+    args = parser.parse_args()
+
+    calls: Counter = Counter()
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            os.makedirs("src")
+            with open(os.path.join("src", "sessions.json"), "w", encoding="utf-8") as f:
+                sessions = {f"bench{i + 1}": [0, "", 0, 10 ** 9, dt.date.today().isoformat()] for i in range(args.sessions)}
+                json.dump(sessions, f)
+            report_path = os.path.join(tmp, "report.html")
+            generate_report(report_path, args.report_cards, seed=args.seed)
+            with open(report_path, "rb") as f:
+                report = f.read()
+
+            if args.tracemalloc:
+                tracemalloc.start()
+            start = time.perf_counter()
+            latencies, lags, wks = asyncio.run(run_pipeline(args, report, calls))
+            elapsed = time.perf_counter() - start
+            if args.tracemalloc:
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+            else:
+                # ru_maxrss в Linux — в килобайтах
+                peak = sum(resource.getrusage(who).ru_maxrss for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)) * 1024
+        finally:
+            os.chdir(cwd)
+
+    # Строка считается обработанной, когда результат попал в лист; время — по всем вызовам process_row
+    written = sum(1 for row in wks.rows[1:] if len(row) >= 6 and row[5])
+    rows = max(written, 1)
+    result = {
+        "rows": written,
+        "attempts": len(latencies),
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(written / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(_percentile(latencies, 0.5) * 1000, 1),
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000, 1),
+        "loop_lag_p95_ms": round(_percentile(lags, 0.95) * 1000, 1),
+        "loop_lag_max_ms": round(max(lags, default=0.0) * 1000, 1),
+        "peak_mb": round(peak / 2 ** 20, 2),
+        "calls_per_row": {name: round(count / rows, 3) for name, count in sorted(calls.items())},
+    }
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False))
+        return
+
+    print(f"rows {written} (process_row calls {result['attempts']}) in {result['seconds']} s: {result['rows_per_sec']} rows/s")
+    print(f"row latency: p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms")
+    print(f"event loop lag: p95 {result['loop_lag_p95_ms']} ms, max {result['loop_lag_max_ms']} ms")
+    print(f"peak memory ({'tracemalloc' if args.tracemalloc else 'RSS'}): {result['peak_mb']} MB")
+    print("API calls per row:")
+    for name, per_row in result["calls_per_row"].items():
+        print(f"  {name:<28} {per_row:>7.3f}")
+
+
+if __name__ == "__main__":
+    main()
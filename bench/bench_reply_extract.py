@@ -0,0 +1,171 @@
+"""
+Разбор текста ответов бота: прежние отдельные проходы регулярками (check_limit в сборщике ответа и в _ask_bot,
+findall/search в поиске, фильтр +380 в process_row) против одного прохода src/reply_extract.py.
+
+Сначала сверяет результаты с эталонами bench/reply_corpus/*.json (сообщения одного ответа в .txt
+разделены строкой "---"), затем замеряет время на корпусе и на синтетических ответах разного размера.
+
+    python bench/bench_reply_extract.py [--lines 10 100 1000] [--repeat 200]
+    python bench/bench_reply_extract.py --update-golden  # переписать эталоны по текущему разбору
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import re
+import sys
+import time
+
+from types import SimpleNamespace
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.html_report import EMAIL_PATTERN, PHONE_PATTERN  # noqa: E402
+from src.reply_extract import extract_reply, is_final_text, limit_status, normalize_phones, scan_text  # noqa: E402
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "reply_corpus")
+MESSAGE_SEPARATOR = "\n---\n"
+
+ERROR_PATTERNS = [
+    [re.compile(r"услов\w*.*бот.*подписк", re.I), "Условием данного бота является подписка на"],
+    [re.compile(r"уч[её]тн\w*.запис\w*.*заблок", re.I), "Учетная запись заблокирована"],
+    [re.compile(r"ваш\w*.*аккаунт\w*.*заблок", re.I), "Ваш аккаунт был заблокирован"],
+    [re.compile(r"исчерпал\w*.*лимит\w*.*запрос", re.I), "Превышен дневной лимит запросов"]
+]
+BIRTHDAY_PATTERN = re.compile(
+    r"(?:Даты рождения:|Дата рождения:)\s*[\n\r│├└─]*\s*(\d{2}\.\d{2}\.\d{4})"
+)
+
+
+def check_limit(messages):
+    for message in messages:
+        text = message.message or ""
+        for pattern, normalized_text in ERROR_PATTERNS:
+            if pattern.search(text):
+                return normalized_text
+    return None
+
+
+def legacy_extract(messages) -> dict:
+    """Прежний разбор — эталон для сравнения: те же проходы, что делал бот на каждый ответ /raw."""
+    # Сборщик ответа проверял каждое пришедшее сообщение, затем _ask_bot и get_phone_numbers_raw_inn — весь ответ
+    for message in messages:
+        text = message.message or ""
+        "ничего не найдено" in text or check_limit([message])
+    check_limit(messages)
+    limit = check_limit(messages)
+    if limit:
+        return {"phones": [], "emails": [], "birthday": None, "limit": limit, "not_found": False}
+
+    data = {"phones": [], "emails": [], "birthday": None, "limit": None, "not_found": False}
+    for message in messages:
+        if message.message and "ничего не найдено" in message.message:
+            data["not_found"] = True
+            break
+        if message.message:
+            data["phones"].extend(PHONE_PATTERN.findall(message.message))
+            data["emails"].extend(EMAIL_PATTERN.findall(message.message))
+            birth_match = BIRTHDAY_PATTERN.search(message.message)
+            if birth_match:
+                data["birthday"] = birth_match.group(1)
+
+    phones = set(num.strip() for num in data["phones"] if num.strip())
+    data["phones"] = [re.sub(r"^\+", "", number) for number in phones if not number.startswith("+380")]
+    data["emails"] = list(set(e.strip() for e in data["emails"] if e.strip()))
+    return data
+
+
+def new_extract(messages) -> dict:
+    """Те же шаги через src/reply_extract.py; кэш сброшен, чтобы каждый текст действительно сканировался."""
+    scan_text.cache_clear()
+    for message in messages:
+        is_final_text(message.message or "")
+    limit_status(messages)
+    reply = extract_reply(messages)
+    data = reply._asdict()
+    data["phones"] = normalize_phones(reply.phones)
+    return data
+
+
+def _comparable(data: dict) -> tuple:
+    return sorted(data["phones"]), sorted(data["emails"]), data["birthday"], data["limit"], data["not_found"]
+
+
+def load_corpus() -> List[tuple]:
+    cases = []
+    for path in sorted(glob.glob(os.path.join(CORPUS_DIR, "*.txt"))):
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        messages = [SimpleNamespace(message=part) for part in text.split(MESSAGE_SEPARATOR)]
+        cases.append((os.path.splitext(os.path.basename(path))[0], messages))
+    return cases
+
+
+def check_golden(cases: List[tuple], update: bool) -> None:
+    failed = []
+    for name, messages in cases:
+        result = extract_reply(messages)._asdict()
+        golden_path = os.path.join(CORPUS_DIR, f"{name}.json")
+        if update:
+            with open(golden_path, "w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False, indent=4)
+                f.write("\n")
+            continue
+        with open(golden_path, "r", encoding="utf-8") as f:
+            if json.load(f) != result:
+                failed.append(name)
+        if _comparable(legacy_extract(messages)) != _comparable(new_extract(messages)):
+            print(f"  {name}: разбор отличается от прежнего")
+    if failed:
+        raise SystemExit(f"Не совпали с эталоном: {', '.join(failed)}")
+    print(f"Эталоны: {len(cases)} ответов" + (" переписаны" if update else " совпали"))
+
+
+def generate_reply(lines: int, seed: int = 1) -> list:
+    rnd = random.Random(seed)
+    out = [f"ИНН {rnd.randint(10 ** 11, 10 ** 12 - 1)}", f"├ Дата рождения: {rnd.randint(1, 28):02d}.{rnd.randint(1, 12):02d}.1980"]
+    for i in range(lines):
+        draw = rnd.random()
+        if draw < 0.4:
+            out.append(f"├ Телефон: +{rnd.choice(['7', '380', '375'])}{rnd.randint(900000000, 999999999)}")
+        elif draw < 0.6:
+            out.append(f"├ Email: user{rnd.randint(1, 10 ** 6)}@mail.ru")
+        else:
+            out.append(f"├ Адрес: г. Москва, ул. Ленина, д. {i}, кв. {rnd.randint(1, 300)}")
+    return [SimpleNamespace(message="\n".join(out))]
+
+
+def measure(func, replies: List[list], repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for messages in replies:
+            func(messages)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--update-golden", action="store_true")
+    args = parser.parse_args()
+
+    cases = load_corpus()
+    check_golden(cases, args.update_golden)
+
+    samples = [("корпус", [messages for _, messages in cases])]
+    samples += [(f"{lines} строк", [generate_reply(lines)]) for lines in args.lines]
+    print(f"{'ответ':>12} | {'прежний, мкс':>13} | {'один проход, мкс':>16} | {'ускорение':>9}")
+    for name, replies in samples:
+        legacy_time = measure(legacy_extract, replies, args.repeat)
+        new_time = measure(new_extract, replies, args.repeat)
+        print(f"{name:>12} | {legacy_time * 1e6:>13.1f} | {new_time * 1e6:>16.1f} | {legacy_time / new_time:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
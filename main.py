@@ -1,41 +1,122 @@
 import asyncio
-import os
 import random
 
-from telethon import TelegramClient
-
-from src.google_sheets import update_phones
-from src.utils import load_json, logger
+from src.client_pool import get_client_pool
+from src.google_sheets import build_pending_index, build_row_queue, build_writer, get_worksheet, update_phones
+from src.instrumentation import run_snapshot_writer
+from src.lookup_strategy import get_planner
+from src.scheduler import IDLE_RECHECK, get_scheduler
+from src.sheet_writer import SheetBatchWriter, SheetFlushError
+from src.tracing import run_trace_writer
+from src.utils import logger
 
 BOT_USERNAME = "@UssboxBot"  # юзернейм бота, откуда будем получать инфу
+# Все сессии работают одновременно и разбирают строки из общей очереди.
+# False — старый режим: сессии по очереди, с паузой между ними.
+CONCURRENT_SESSIONS = True
+SESSION_START_DELAY = (5, 20)  # разброс старта сессий в параллельном режиме, секунды
+CYCLE_PAUSE = (45, 100)  # пауза между циклами, секунды
+
+
+async def run_session(
+    session_name: str,
+    items: list,
+    row_queue: asyncio.Queue,
+    writer: SheetBatchWriter,
+    start_delay: int = 0,
+):
+    """
+    Подключает одну сессию и разбирает строки из row_queue, пока не кончится очередь или лимит сессии.
+    """
+    with logger.contextualize(session=session_name):
+        if start_delay:
+            await asyncio.sleep(start_delay)
+
+        scheduler = get_scheduler()
+        logger.info(
+            f"Подключение к {session_name} | строк в очереди [{row_queue.qsize()}] | "
+            f"квота [{scheduler.used(session_name)}/{scheduler.limit(session_name)}]"
+        )
+        # Клиент и InputPeer бота живут весь процесс: без рукопожатия и поиска бота в каждом цикле
+        pool = get_client_pool()
+        try:
+            client = await pool.get(session_name, items)
+            chat_entity = await pool.resolve(session_name, client, BOT_USERNAME)
+            stop_reason = await update_phones(
+                chat_entity, client, session_name=session_name, row_queue=row_queue, writer=writer
+            )
+        except Exception as e:
+            logger.exception(e)
+            return
+
+        if stop_reason:
+            logger.info(f"Сессия {session_name} остановлена: {stop_reason}")
+        else:
+            logger.info(f"Сессия {session_name} завершила работу: очередь пуста")
+
+
+async def _close_writer(writer: SheetBatchWriter):
+    try:
+        await writer.close()
+    except SheetFlushError as e:
+        logger.error(f"Результаты не записаны в таблицу: {e}")
 
 
 async def main():
+    scheduler = get_scheduler()
+    # Снимок метрик для /metrics в админке
+    asyncio.create_task(run_snapshot_writer())
+    # Последние трассы строк для водопада на дашборде
+    asyncio.create_task(run_trace_writer())
+    # Индекс незаполненных строк живёт весь процесс: между циклами дочитываются только новые строки
+    index = build_pending_index()
+    pool = get_client_pool()
     while True:
-        sessions = load_json()
-
-        for session_name, items in sessions.items():
-            logger.info(f"Подключение к {session_name} | всего сессий [{len(sessions)}]")
-            # Ensure dedicated sessions directory exists and use it for .session files
-            os.makedirs("sessions", exist_ok=True)
-            session_path = os.path.join("sessions", session_name)
-
-            client = TelegramClient(session_path, items[0], items[1], system_version="4.16.30-vxCUSTOM")
-            async with client:
-                chat_entity = await client.get_entity(BOT_USERNAME)
-                try:
-                    await update_phones(chat_entity, client, session_name=session_name)
-                except Exception as e:
-                    logger.exception(e)
+        await pool.check()
+        scheduler.reload()
+        sessions = scheduler.available_sessions()
+        if not sessions:
+            wait = scheduler.seconds_until_reset()
+            logger.info(f"У всех сессий исчерпана квота, ждём сброса {scheduler.next_reset():%Y-%m-%d %H:%M} ({wait / 60 / 60:.1f} ч.)")
+            await asyncio.sleep(wait + 1)
+            continue
+
+        wks = await get_worksheet()
+        writer = build_writer(wks, index)
+        writer.start()
+        # Заодно дописывает в лист ответы из журнала, не записанные до перезапуска
+        row_queue = await build_row_queue(index, wks, writer)
+        if row_queue.empty():
+            await _close_writer(writer)
+            wait = min(IDLE_RECHECK, scheduler.seconds_until_reset() + 1)
+            logger.info(f"Нет строк для обработки, повторная проверка через {wait / 60:.0f} мин.")
+            await asyncio.sleep(wait)
+            continue
+
+        if CONCURRENT_SESSIONS:
+            logger.info(f"Параллельный запуск сессий | сессий с квотой [{len(sessions)}]")
+            tasks = [
+                asyncio.create_task(
+                    run_session(session_name, items, row_queue, writer, start_delay=i * random.randint(*SESSION_START_DELAY))
+                )
+                for i, (session_name, items) in enumerate(sessions)
+            ]
+            await asyncio.gather(*tasks)
+        else:
+            for session_name, items in sessions:
+                await run_session(session_name, items, row_queue, writer)
+                if row_queue.empty():
+                    break
 
                 session_cooldown = random.randint(45, 100)
-                logger.info(f"Сессия {session_name} достиг суточного лимита в боте, кулдаун {session_cooldown} секунд перед следующей сессией")
+                logger.info(f"Кулдаун {session_cooldown} секунд перед следующей сессией")
                 await asyncio.sleep(session_cooldown)
 
-        event_cooldown = random.randint(14 * 60 * 60, 26 * 60 * 60)
-        logger.info(f"Все сессии достигли суточного лимита в боте, кулдаун {event_cooldown / 60 / 60} часа перед следующим циклом")
-        await asyncio.sleep(event_cooldown)
-        continue
+        await _close_writer(writer)
+        scheduler.flush()
+        logger.info(f"Цикл завершён | квоты сессий: {scheduler.summary()}")
+        logger.info(f"Второй запрос (ФИО + ДР) по стратегиям: {get_planner().summary()}")
+        await asyncio.sleep(random.randint(*CYCLE_PAUSE))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,164 @@
+import asyncio
+
+from typing import Callable, Dict, List, Optional
+
+from telethon import TelegramClient, events
+from telethon.tl.types import Message
+
+from src.tracing import span
+from src.utils import logger
+
+REPLY_TIMEOUT = 90  # сколько максимум ждём ответ бота, секунды
+REPLY_SETTLE = 5  # если ответ не финальный, ждём столько после последнего сообщения/правки, секунды
+
+
+class NoReplyError(Exception):
+    """Бот ничего не ответил на запрос за отведённое время: это не пустой результат, а его отсутствие."""
+
+
+class _PendingReply:
+    """
+    Ответ бота на один запрос. Future завершается, когда пришло финальное сообщение
+    (документ, "ничего не найдено", лимит) или бот замолчал на REPLY_SETTLE секунд.
+    """
+
+    def __init__(self, is_final: Optional[Callable[[Message], bool]], settle: float):
+        self.loop = asyncio.get_running_loop()
+        self.future: asyncio.Future = self.loop.create_future()
+        self.is_final = is_final
+        self.settle = settle
+        self.sent_id: Optional[int] = None
+        self.messages: Dict[int, Message] = {}
+        self._settle_handle: Optional[asyncio.TimerHandle] = None
+
+    def feed(self, message: Message) -> None:
+        if self.future.done():
+            return
+        if self.sent_id is not None and message.id <= self.sent_id:
+            return
+        # Правка сообщения заменяет его прежнюю версию
+        self.messages[message.id] = message
+        self._reschedule()
+
+    def set_sent_id(self, sent_id: int) -> None:
+        """Отбрасывает сообщения, пришедшие раньше нашего запроса."""
+        self.sent_id = sent_id
+        self.messages = {mid: m for mid, m in self.messages.items() if mid > sent_id}
+        if self.messages:
+            self._reschedule()
+
+    def collected(self) -> List[Message]:
+        return [self.messages[mid] for mid in sorted(self.messages)]
+
+    def cancel(self) -> None:
+        if self._settle_handle is not None:
+            self._settle_handle.cancel()
+        if not self.future.done():
+            self.future.cancel()
+
+    def _reschedule(self) -> None:
+        if self._settle_handle is not None:
+            self._settle_handle.cancel()
+            self._settle_handle = None
+
+        # Пока не знаем id нашего запроса, не можем решить, что ответ полный
+        if self.sent_id is not None and self.is_final and any(self.is_final(m) for m in self.messages.values()):
+            self._resolve()
+        else:
+            self._settle_handle = self.loop.call_later(self.settle, self._resolve)
+
+    def _resolve(self) -> None:
+        if not self.future.done() and self.sent_id is not None:
+            self.future.set_result(self.collected())
+
+
+class ReplyCollector:
+    """
+    Отправляет запрос боту и собирает его ответ по событиям NewMessage/MessageEdited
+    вместо фиксированной паузы и чтения последних сообщений чата.
+    Одновременно в работе один запрос на клиента.
+    """
+
+    def __init__(
+        self,
+        client: TelegramClient,
+        chat,
+        is_final: Optional[Callable[[Message], bool]] = None,
+        timeout: float = REPLY_TIMEOUT,
+        settle: float = REPLY_SETTLE,
+    ):
+        self.client = client
+        self.chat = chat
+        self.is_final = is_final
+        self.timeout = timeout
+        self.settle = settle
+        self._pending: Optional[_PendingReply] = None
+        self._lock = asyncio.Lock()
+
+        client.add_event_handler(self._on_message, events.NewMessage(chats=chat, incoming=True))
+        client.add_event_handler(self._on_message, events.MessageEdited(chats=chat, incoming=True))
+
+    async def request(self, text: str, timeout: Optional[float] = None) -> List[Message]:
+        """
+        Отправляет text боту и возвращает сообщения его ответа по порядку.
+        По таймауту возвращает то, что успело прийти, или новые сообщения чата после запроса;
+        если нет и их — бросает NoReplyError.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        async with self._lock:
+            # Ждём ответ ещё до отправки: бот может ответить раньше, чем вернётся send_message
+            pending = _PendingReply(self.is_final, self.settle)
+            self._pending = pending
+            try:
+                with span("send"):
+                    sent = await self.client.send_message(self.chat, text)
+                pending.set_sent_id(sent.id)
+                try:
+                    with span("wait"):
+                        return await asyncio.wait_for(asyncio.shield(pending.future), timeout)
+                except asyncio.TimeoutError:
+                    messages = pending.collected()
+                    logger.warning(f"Бот не ответил полностью за {timeout} сек., получено сообщений: {len(messages)}")
+                    if messages:
+                        return messages
+                    with span("get_messages"):
+                        last_messages = await self.client.get_messages(self.chat, 2)
+                    messages = [m for m in reversed(last_messages) if m.id > sent.id]
+                    if not messages:
+                        raise NoReplyError(f"Бот не ответил на запрос за {timeout} сек.")
+                    return messages
+            finally:
+                pending.cancel()
+                self._pending = None
+
+    def close(self) -> None:
+        """Снимает обработчики событий с клиента."""
+        self.client.remove_event_handler(self._on_message)
+        if self._pending is not None:
+            self._pending.cancel()
+
+    async def _on_message(self, event) -> None:
+        if self._pending is not None:
+            self._pending.feed(event.message)
+
+
+# Сборщик держит ссылку на клиента, поэтому запись убирается явно через drop_collector, когда клиент закрыт
+_collectors: Dict[TelegramClient, ReplyCollector] = {}
+
+
+def get_collector(
+    client: TelegramClient, chat, is_final: Optional[Callable[[Message], bool]] = None
+) -> ReplyCollector:
+    """Один сборщик ответов на клиента; обработчики событий регистрируются один раз."""
+    collector = _collectors.get(client)
+    if collector is None:
+        collector = ReplyCollector(client, chat, is_final=is_final)
+        _collectors[client] = collector
+    return collector
+
+
+def drop_collector(client: TelegramClient) -> None:
+    """Убирает сборщик ответов клиента и его обработчики событий: клиент закрыт или заменён."""
+    collector = _collectors.pop(client, None)
+    if collector is not None:
+        collector.close()
@@ -0,0 +1,141 @@
+import asyncio
+import datetime as dt
+import os
+
+from typing import Dict, Optional, Tuple
+
+from telethon import TelegramClient, errors, utils
+from telethon.tl.types import InputPeerUser, TypeInputPeer
+
+from src.bot_replies import drop_collector
+from src.storage import load_json_state, save_json_atomic
+from src.utils import logger
+
+SESSIONS_DIR = "sessions"
+PEERS_PATH = os.path.join("src", "peers.json")
+SYSTEM_VERSION = "4.16.30-vxCUSTOM"
+RECONNECT_ATTEMPTS = 5
+RECONNECT_BACKOFF = (1, 60)  # первая и максимальная пауза между попытками переподключения, секунды
+
+
+def _load_peers() -> Dict[str, dict]:
+    return load_json_state(PEERS_PATH, {}, f"Не удалось прочитать {PEERS_PATH}, бот будет найден заново")
+
+
+def _save_peer(session_name: str, username: str, peer: InputPeerUser) -> None:
+    peers = _load_peers()
+    peers.setdefault(session_name, {})[username] = {
+        "user_id": peer.user_id,
+        "access_hash": peer.access_hash,
+        "updated_at": dt.datetime.now().isoformat(timespec="seconds"),
+    }
+    save_json_atomic(PEERS_PATH, peers)
+
+
+async def ensure_connected(client: TelegramClient, attempts: int = RECONNECT_ATTEMPTS) -> None:
+    """
+    Переподключает клиента, только если соединение потеряно, с растущей паузой между попытками.
+    Если подключиться не удалось, бросает ConnectionError.
+    """
+    if client.is_connected():
+        return
+
+    delay, max_delay = RECONNECT_BACKOFF
+    for attempt in range(1, attempts + 1):
+        try:
+            await client.connect()
+            logger.info("Соединение с Telegram восстановлено")
+            return
+        except (OSError, ConnectionError) as e:
+            logger.warning(f"Не удалось подключиться к Telegram ({attempt}/{attempts}): {e}, повтор через {delay} сек.")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, max_delay)
+    raise ConnectionError("Не удалось подключиться к Telegram")
+
+
+class ClientPool:
+    """
+    Клиенты Telegram, подключённые на всё время работы процесса: рукопожатие MTProto выполняется один раз на сессию,
+    а не в каждом цикле. InputPeer бота кэшируется на диске по сессиям (PEERS_PATH) и проверяется один раз за процесс,
+    так что get_entity по юзернейму не вызывается каждый цикл.
+    """
+
+    def __init__(self):
+        self.clients: Dict[str, TelegramClient] = {}
+        self._peers: Dict[Tuple[str, str], TypeInputPeer] = {}
+        self._lock = asyncio.Lock()
+
+    async def get(self, session_name: str, items: list) -> TelegramClient:
+        """Подключённый клиент сессии; создаётся при первом обращении."""
+        async with self._lock:
+            client = self.clients.get(session_name)
+            if client is None:
+                os.makedirs(SESSIONS_DIR, exist_ok=True)
+                client = TelegramClient(
+                    os.path.join(SESSIONS_DIR, session_name), items[0], items[1], system_version=SYSTEM_VERSION
+                )
+                await client.start()
+                self.clients[session_name] = client
+                logger.info(f"Клиент {session_name} подключён")
+        await ensure_connected(client)
+        return client
+
+    async def resolve(self, session_name: str, client: TelegramClient, username: str) -> TypeInputPeer:
+        """InputPeer бота для этой сессии: из памяти, с диска (с одной проверкой за процесс) или через get_entity."""
+        key = (session_name, username)
+        peer = self._peers.get(key)
+        if peer is not None:
+            return peer
+
+        cached = _load_peers().get(session_name, {}).get(username)
+        if cached:
+            peer = InputPeerUser(cached["user_id"], cached["access_hash"])
+            try:
+                # Проверка по id и access_hash, без поиска по юзернейму
+                await client.get_entity(peer)
+            except (ValueError, errors.PeerIdInvalidError, errors.UserIdInvalidError) as e:
+                logger.warning(f"Сохранённый бот {username} для {session_name} не подошёл ({e}), ищем заново")
+                peer = None
+
+        if peer is None:
+            peer = utils.get_input_peer(await client.get_entity(username))
+            try:
+                _save_peer(session_name, username, peer)
+            except OSError as e:
+                logger.warning(f"Не удалось сохранить {PEERS_PATH}: {e}")
+
+        self._peers[key] = peer
+        return peer
+
+    async def check(self) -> None:
+        """Проверка перед циклом: отключившиеся клиенты переподключаются, безнадёжные убираются из пула."""
+        for session_name, client in list(self.clients.items()):
+            try:
+                await ensure_connected(client)
+            except ConnectionError:
+                logger.error(f"Клиент {session_name} не подключается, будет создан заново")
+                await self.drop(session_name)
+
+    async def drop(self, session_name: str) -> None:
+        client = self.clients.pop(session_name, None)
+        self._peers = {key: peer for key, peer in self._peers.items() if key[0] != session_name}
+        if client is not None:
+            drop_collector(client)
+            try:
+                await client.disconnect()
+            except Exception:
+                pass
+
+    async def close(self) -> None:
+        for session_name in list(self.clients):
+            await self.drop(session_name)
+
+
+_pool: Optional[ClientPool] = None
+
+
+def get_client_pool() -> ClientPool:
+    global _pool
+    if _pool is None:
+        _pool = ClientPool()
+    return _pool
@@ -1,16 +1,44 @@
 import asyncio
-import os
-import random
+import functools
+import shutil
+import tempfile
 import traceback
 import gspread
-import re
 
-from typing import Union, Optional, Dict, List
-from bs4 import BeautifulSoup
+from typing import Union, Optional, Dict, List, NamedTuple, Set
 from telethon import errors
 from telethon.sync import TelegramClient
 from telethon.tl.types import Message, MessageMediaDocument
 
+from src.bot_replies import NoReplyError, get_collector
+from src.client_pool import ensure_connected
+from src.instrumentation import (
+    BOT_REPLY_LATENCY,
+    BOT_REQUESTS,
+    CACHE_LOOKUPS,
+    DEDUP_SAVED,
+    FLOOD_WAITS,
+    HTML_PARSE_LATENCY,
+    LOOKUP_LATENCY,
+    MEDIA_DOWNLOAD_LATENCY,
+    QUEUE_DEPTH,
+    ROWS,
+    SHEETS_LATENCY,
+    InstrumentedWorksheet,
+)
+from src.journal import RowJournal, get_journal
+from src.lookup_strategy import get_planner
+from src.metrics import ERROR, PROCESSED, record_event
+from src.pacing import get_limiter, session_name_of
+from src.pending import PendingIndex, RowTask
+from src.reply_extract import BAN_TEXTS, extract_reply, is_final_text, limit_status, normalize_phones, scan_text
+from src.report_parsing import ReportData, parse_report
+from src.result_cache import get_cache, normalize_inn
+from src.result_store import get_result_store
+from src.scheduler import get_scheduler
+from src.sheet_writer import SheetBatchWriter, SheetFlushError
+from src.sheets_io import READ, AsyncWorksheet, get_governor
+from src.tracing import STOPPED, span, trace_row
 from src.utils import logger
 
 # TEST
@@ -23,308 +51,433 @@ table_url = "https://docs.google.com/spreadsheets/d/1y64pA_GnOPT2shVXHnwrfWDpeNq
 table_key = "1y64pA_GnOPT2shVXHnwrfWDpeNq3vrdRv0RN-9dwljI"
 worksheet_name = "Лист2"
 
-gc = gspread.service_account("src/service-acount-sheets.json")
-table = gc.open_by_key(table_key)
+SERVICE_ACCOUNT_PATH = "src/service-acount-sheets.json"
+# Таблица открывается при первом обращении: модуль можно импортировать без ключа сервисного аккаунта
+table = None
 
 FIO_COL = 3
 INN_COL = 4
 PHONE_COL = 6
 # Отдельный столбец для email адресов
 EMAIL_COL = 7
-COOLDOWN = (15, 30)
-COOLDOWN_REQUEST = (30, 60)
-
-ERROR_PATTERNS = [
-    [re.compile(r"услов\w*.*бот.*подписк", re.I), "Условием данного бота является подписка на"],
-    [re.compile(r"уч[её]тн\w*.запис\w*.*заблок", re.I), "Учетная запись заблокирована"],
-    [re.compile(r"ваш\w*.*аккаунт\w*.*заблок", re.I), "Ваш аккаунт был заблокирован"],
-    [re.compile(r"исчерпал\w*.*лимит\w*.*запрос", re.I), "Превышен дневной лимит запросов"]
-]
-PHONE_PATTERN = re.compile(r'\+\d{9,15}')
-# Базовый паттерн email
-EMAIL_PATTERN = re.compile(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}")
-BIRTHDAY_PATTERN = re.compile(
-    r"(?:Даты рождения:|Дата рождения:)\s*[\n\r│├└─]*\s*(\d{2}\.\d{2}\.\d{4})"
-)
-
-
-def check_limit(messages: Message) -> Optional[str]:
-    for message in messages:
-        text = message.message
-
-        for pattern, normalized_text in ERROR_PATTERNS:
-            if pattern.search(text):
-                return normalized_text
-
-    return None
+# Паузы между запросами к боту подбираются на лету для каждой сессии, см. src/pacing.py
+# HTML-отчёты до этого размера скачиваются в память, больше — во временную папку
+MEDIA_MEMORY_LIMIT = 16 * 1024 * 1024
+MEDIA_TEMP_DIR = None  # None — системная папка для временных файлов
 
 
-def generate_cooldown(request: bool = False):
-    cooldown = random.randint(*COOLDOWN)
-    if request:
-        cooldown = random.randint(*COOLDOWN_REQUEST)
+class BotLookupError(Exception):
+    """Запрос к боту не удался (ошибка отправки или разбора ответа) — результата для записи нет."""
 
-    logger.debug(f"Кулдаун перед следующим запросом - {cooldown}")
 
-    return cooldown
+def _is_final_reply(message: Message) -> bool:
+    """Сообщение, после которого бот больше ничего не пришлёт на этот запрос."""
+    if isinstance(message.media, MessageMediaDocument):
+        return True
+    return is_final_text(message.message or "")
 
 
-async def _ensure_connected(client: TelegramClient, attempts: int = 3):
-    """Ensure Telethon client connection is alive."""
-    for _ in range(attempts):
+async def _ask_bot(client: TelegramClient, chat, text: str, kind: str) -> List[Message]:
+    """
+    Отправляет запрос боту в темпе, который разрешает ограничитель сессии, и ждёт его полный ответ.
+    FloodWaitError и сообщения о блокировке снижают скорость сессии, успешные ответы — повышают.
+    Дневной лимит скорость не меняет: его учитывает планировщик квот.
+    """
+    await ensure_connected(client)
+    collector = get_collector(client, chat, is_final=_is_final_reply)
+    session_name = session_name_of(client) or "default"
+    limiter = get_limiter(session_name)
+    scheduler = get_scheduler()
+
+    attempt = 0
+    while True:
+        with span("pacing"):
+            await limiter.acquire()
         try:
-            await client.connect()
-            return
-        except Exception:
-            await asyncio.sleep(1)
-    # best effort; Telethon usually reconnects itself later
-    return
-
-
-def get_phone_numbers_and_birthdate_from_html(target_fullname: str, html_file_name: str):
-    target_fullname_norm = re.sub(r'\s+', ' ', target_fullname.lower().strip())
-
-    with open(html_file_name, "r", encoding="utf-8") as file:
-        soup = BeautifulSoup(file, "html.parser")
-
-    phones = set()
-    emails = set()
-    birth_date = None
-
-    for card in soup.find_all("div", class_="card"):
-        fio_parts = {"фамилия": "", "имя": "", "отчество": ""}
-        full_name = ""
-
-        for row in card.find_all("div", class_="row"):
-            left = row.find("div", class_="row_left")
-            right = row.find("div", class_="row_right")
-            if not left or not right:
-                continue
-
-            label = left.text.strip().lower()
-            value = right.text.strip()
-
-            if "фио" in label:
-                full_name = value
-            elif "фамилия" in label:
-                fio_parts["фамилия"] = value
-            elif "имя" in label and "отчество" not in label:
-                fio_parts["имя"] = value
-            elif "отчество" in label:
-                fio_parts["отчество"] = value
-
-        if not full_name:
-            full_name = " ".join(fio_parts.values()).strip()
-
-        full_name_norm = re.sub(r'\s+', ' ', full_name.lower().strip())
-
-        if target_fullname_norm in full_name_norm:
-            for row in card.find_all("div", class_="row"):
-                left = row.find("div", class_="row_left")
-                right = row.find("div", class_="row_right")
-                if not left or not right:
-                    continue
-
-                label = left.text.strip().lower()
-                value = right.text.strip()
-
-                if "телефон" in label:
-                    raw_phones = value
-                    possible_phones = re.split(r"[,\s]+", raw_phones)
-
-                    for phone in possible_phones:
-                        phone = phone.strip()
-                        if PHONE_PATTERN.fullmatch(phone):
-                            phones.add(phone)
-
-                # Email может быть под разными лейблами
-                elif ("email" in label) or ("e-mail" in label) or ("электрон" in label and "почт" in label):
-                    for email in EMAIL_PATTERN.findall(value):
-                        emails.add(email)
-                elif "дата рождения" in label and not birth_date:
-                    birth_date = value
-
-            # На случай, если email указан где-то в блоке без явного лейбла
-            block_text = card.get_text(" ")
-            for email in EMAIL_PATTERN.findall(block_text):
-                emails.add(email)
-
-    return {
-        "phones": list(phones),
-        "emails": list(emails),
-        "birthday": birth_date,
-    }
+            with BOT_REPLY_LATENCY.time(session=session_name, kind=kind):
+                messages = await collector.request(text)
+            scheduler.record_request(session_name)
+            BOT_REQUESTS.inc(session=session_name, kind=kind)
+            break
+        except NoReplyError:
+            # Запрос ушёл и расходует квоту, но молчание бота — не успешный ответ: скорость не повышаем
+            scheduler.record_request(session_name)
+            BOT_REQUESTS.inc(session=session_name, kind=kind)
+            raise
+        except errors.FloodWaitError as e:
+            # ограничитель сам выдержит паузу перед повтором
+            FLOOD_WAITS.inc(session=session_name)
+            limiter.on_flood_wait(e.seconds + 10)
+        except ConnectionError:
+            attempt += 1
+            if attempt >= 3:
+                raise ConnectionError(f"Не удалось отправить запрос боту: {text}")
+            logger.warning("Соединение потеряно при запросе к боту, переподключение...")
+            await ensure_connected(client)
+            await asyncio.sleep(2)
+
+    limit = limit_status(messages)
+    if limit:
+        if limit in BAN_TEXTS:
+            limiter.on_limit()
+        # После лимита или бана сессия до сброса квоты бесполезна
+        scheduler.mark_exhausted(session_name)
+    else:
+        limiter.on_success()
+    return messages
+
+
+def _report_messages(messages: List[Message]) -> List[Message]:
+    """HTML-отчёты ответа, пришедшие до сообщения «ничего не найдено» (текст после него тоже не разбирается)."""
+    reports = []
+    for message in messages:
+        if scan_text(message.message or "").not_found:
+            break
+        if isinstance(message.media, MessageMediaDocument):
+            reports.append(message)
+    return reports
 
 
+async def _parse_report_media(message: Message, fio: str) -> Optional[ReportData]:
+    """
+    Скачивает HTML-отчёт из сообщения и разбирает его вне цикла событий (src/report_parsing.py).
+    Возвращает None, если документ не HTML.
+    """
+    file = message.file
+    name = (file.name or "").lower() if file else ""
+    if not file or not (name.endswith(".html") or file.mime_type == "text/html"):
+        return None
+
+    if file.size and file.size > MEDIA_MEMORY_LIMIT:
+        # Большой отчёт — в личную временную папку, которую удаляем целиком
+        tmp_dir = tempfile.mkdtemp(prefix="report-", dir=MEDIA_TEMP_DIR)
+        try:
+            with span("download"), MEDIA_DOWNLOAD_LATENCY.time(storage="disk"):
+                file_path = await message.download_media(file=tmp_dir)
+            with span("parse"), HTML_PARSE_LATENCY.time():
+                return await parse_report(fio, file_path)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    with span("download"), MEDIA_DOWNLOAD_LATENCY.time(storage="memory"):
+        content = await message.download_media(file=bytes)
+    with span("parse"), HTML_PARSE_LATENCY.time():
+        return await parse_report(fio, content)
+
+
+def _timed_lookup(kind: str):
+    """Замеряет время поиска через бота целиком, по сессиям, и отмечает его этапом в трассе строки."""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(client: TelegramClient, chat, *args):
+            with span(kind), LOOKUP_LATENCY.time(session=session_name_of(client) or "default", kind=kind):
+                return await func(client, chat, *args)
+        return wrapper
+    return decorator
+
+
+@_timed_lookup("raw")
 async def get_phone_numbers_raw_inn(
     client: TelegramClient, chat, fio, inn
 ) -> Dict[str, Optional[Union[List[str], str]]]:
     """
     Если найдены номера телефонов, возвращает список из номеров как str и день рождения, если нету день рождения или номеров, то они None.
+    При неизвестной ошибке бросает BotLookupError, при потере соединения — ConnectionError,
+    если бот не ответил — NoReplyError.
     """
     logger.debug(f"Поиск номера по ИНН: /raw {inn}")
 
     try:
-        # make sure we are connected before sending
-        await _ensure_connected(client)
-
-        # send command with simple retries on transient disconnects
-        for attempt in range(3):
-            try:
-                await client.send_message(chat, f"/raw {inn}")
-                break
-            except ConnectionError:
-                logger.warning("Соединение потеряно при отправке /raw, пробую переподключиться...")
-                await _ensure_connected(client)
-                await asyncio.sleep(2)
-        await asyncio.sleep(generate_cooldown())
-
-        # fetch messages with retry as well
-        for attempt in range(3):
-            try:
-                last_messages = await client.get_messages(chat, 2)
-                break
-            except ConnectionError:
-                logger.warning("Соединение потеряно при получении сообщений, переподключение...")
-                await _ensure_connected(client)
-                await asyncio.sleep(2)
-        check = check_limit(last_messages)
-        if check:
+        last_messages = await _ask_bot(client, chat, f"/raw {inn}", "raw")
+        # Телефоны, email, дата рождения и лимит — за один проход по тексту каждого сообщения
+        reply = extract_reply(last_messages)
+        if reply.limit:
             return {
-                "phones": check,
+                "phones": reply.limit,
                 "emails": [],
                 "birthday": None,
             }
 
         data = {
-            "phones": [],
-            "emails": [],
-            "birthday": None,
+            "phones": reply.phones,
+            "emails": reply.emails,
+            "birthday": reply.birthday,
         }
-
-        for message in last_messages:
-            if message.message and "ничего не найдено" in message.message:
-                return data
-
-            # Поиск номеров телефонов в тексте
-            if message.message:
-                matches = PHONE_PATTERN.findall(message.message)
-                data['phones'].extend(matches)
-
-                # Поиск email адресов в тексте
-                email_matches = EMAIL_PATTERN.findall(message.message)
-                data['emails'].extend(email_matches)
-
-                # Поиск даты рождения
-                birth_match = BIRTHDAY_PATTERN.search(message.message)
-                if birth_match:
-                    data['birthday'] = birth_match.group(1)
-
-            # Если это html-документ
-            if isinstance(message.media, MessageMediaDocument):
-                file_path = await message.download_media()
-                try:
-                    if file_path and file_path.endswith('.html'):
-                        logger.debug("HTML scrapping")
-                        html_data = get_phone_numbers_and_birthdate_from_html(fio, file_path)
-                        data['phones'].extend(html_data.get('phones', []))
-                        data['emails'].extend(html_data.get('emails', []))
-                        data['birthday'] = html_data.get('birthday')
-                finally:
-                    if file_path and os.path.exists(file_path):
-                        os.remove(file_path)
-
-        # Удаляем дубли и пробелы
-        data['phones'] = list(set(num.strip() for num in data['phones'] if num.strip()))
-        data['emails'] = list(set(e.strip() for e in data['emails'] if e.strip()))
+        # Отчёты из сообщений до «ничего не найдено» тоже разбираются
+        for message in _report_messages(last_messages):
+            html_data = await _parse_report_media(message, fio)
+            if html_data is not None:
+                logger.debug("HTML scrapping")
+                data['phones'].extend(html_data.get('phones', []))
+                data['emails'].extend(html_data.get('emails', []))
+                data['birthday'] = html_data.get('birthday')
+
+        # Удаляем дубли, пробелы и номера исключённых стран
+        data['phones'] = normalize_phones(data['phones'])
+        data['emails'] = list(dict.fromkeys(e.strip() for e in data['emails'] if e.strip()))
         logger.debug(f"Найдено: {data['phones']}, emails: {data['emails']}, дата рождения: {data['birthday']}")
 
         return data
 
-    except errors.FloodWaitError as e:
-        logger.warning(f"FloodWaitError. Ждём {e.seconds} сек.")
-        await asyncio.sleep(e.seconds + 10)
-        return await get_phone_numbers_raw_inn(client, chat, fio, inn)
-
+    except (ConnectionError, NoReplyError):
+        raise
     except Exception as e:
         logger.exception(f"Неизвестная ошибка при поиске номеров. Краткое описание ошибки: {e}")
-        return {
-            "phones": [],
-            "emails": [],
-            "birthday": None,
-        }
+        raise BotLookupError(f"Неизвестная ошибка: {e}") from e
 
 
+@_timed_lookup("fio_dr")
 async def get_phone_numbers_fio_dr(
     client: TelegramClient, chat, fio, birthday
 ) -> Union[List[str], str]:
     """
     Если найдены номера телефонов, возвращает список из номеров как str, иначе пустой список.
+    При лимите или бане возвращает его текст; при неизвестной ошибке бросает BotLookupError,
+    если бот не ответил — NoReplyError.
     """
     logger.debug(f"Поиск номера по ФИО + ДР: {fio} {birthday}")
 
     try:
-        await _ensure_connected(client)
-
-        for attempt in range(3):
-            try:
-                await client.send_message(chat, f"{fio} {birthday}")
-                break
-            except ConnectionError:
-                logger.warning("Соединение потеряно при отправке ФИО+ДР, переподключение...")
-                await _ensure_connected(client)
-                await asyncio.sleep(2)
-
-        await asyncio.sleep(generate_cooldown())
-
-        for attempt in range(3):
-            try:
-                last_messages = await client.get_messages(chat, 2)
-                break
-            except ConnectionError:
-                logger.warning("Соединение потеряно при получении сообщений (ФИО+ДР), переподключение...")
-                await _ensure_connected(client)
-                await asyncio.sleep(2)
-        check = check_limit(last_messages)
-        if check:
-            return check
-
-        phone_numbers = []
-
-        for message in last_messages:
-            if message.message and "ничего не найдено" in message.message:
-                return []
-
-            # Поиск номеров телефонов в тексте
-            if message.message:
-                matches = PHONE_PATTERN.findall(message.message)
-                phone_numbers.extend(matches)
-
-            # Если это html-документ
-            if isinstance(message.media, MessageMediaDocument):
-                file_path = await message.download_media()
-                try:
-                    if file_path and file_path.endswith('.html'):
-                        html_data = get_phone_numbers_and_birthdate_from_html(fio, file_path)
-                        phone_numbers.extend(html_data.get('phones', []))
-                finally:
-                    if file_path and os.path.exists(file_path):
-                        os.remove(file_path)
-
-        # Удаляем дубли и пробелы
-        phone_numbers = list(set(num.strip() for num in phone_numbers if num.strip()))
+        last_messages = await _ask_bot(client, chat, f"{fio} {birthday}", "fio_dr")
+        reply = extract_reply(last_messages)
+        if reply.limit:
+            return reply.limit
+        phone_numbers = reply.phones
+
+        for message in _report_messages(last_messages):
+            html_data = await _parse_report_media(message, fio)
+            if html_data is not None:
+                phone_numbers.extend(html_data.get('phones', []))
+
+        # Удаляем дубли, пробелы и номера исключённых стран
+        phone_numbers = normalize_phones(phone_numbers)
         logger.debug(f"Найдено: {phone_numbers}")
 
         return phone_numbers
 
-    except errors.FloodWaitError as e:
-        logger.warning(f"FloodWaitError. Ждём {e.seconds} сек.")
-        await asyncio.sleep(e.seconds + 10)
-        return await get_phone_numbers_fio_dr(client, chat, fio, birthday)
-
+    except (ConnectionError, NoReplyError):
+        raise
     except Exception as e:
         logger.exception(f"Неизвестная ошибка при поиске номеров. Краткое описание ошибки: {e}")
-        return []
+        raise BotLookupError(f"Неизвестная ошибка: {e}") from e
+
+
+async def prepare_worksheet(wks: AsyncWorksheet) -> None:
+    """Установим заголовок для столбца email при необходимости."""
+    try:
+        header_email = (await wks.cell(1, EMAIL_COL)).value
+        if not header_email or not header_email.strip():
+            await wks.update_cell(1, EMAIL_COL, "Email")
+    except Exception:
+        pass
+
+
+def get_table():
+    global table
+    if table is None:
+        gc = gspread.service_account(SERVICE_ACCOUNT_PATH)
+        table = gc.open_by_key(table_key)
+    return table
+
+
+def _open_worksheet():
+    with SHEETS_LATENCY.time(op="worksheet"):
+        return get_table().worksheet(worksheet_name)
+
+
+async def get_worksheet() -> AsyncWorksheet:
+    """
+    Рабочий лист. Вызовы к нему выполняются вне цикла событий (src/sheets_io.py)
+    и замеряются (src/instrumentation.py).
+    """
+    return AsyncWorksheet(InstrumentedWorksheet(await get_governor().call(READ, _open_worksheet)))
+
+
+def get_row_journal() -> RowJournal:
+    return get_journal(f"{table_key}:{worksheet_name}")
+
+
+def build_pending_index() -> PendingIndex:
+    return PendingIndex(FIO_COL, INN_COL, PHONE_COL, EMAIL_COL)
+
+
+def build_writer(wks: AsyncWorksheet, index: Optional[PendingIndex] = None) -> SheetBatchWriter:
+    """
+    Буфер записи результатов в столбцы телефонов и email.
+    Записанные строки отмечаются в журнале и убираются из index.
+    """
+    journal = get_row_journal()
+
+    def on_flushed(rows: List[int]) -> None:
+        journal.mark_written(rows)
+        if index is not None:
+            index.mark_done(rows)
+
+    return SheetBatchWriter(wks, columns=(PHONE_COL, EMAIL_COL), on_flushed=on_flushed)
+
+
+async def replay_journal(writer: SheetBatchWriter, index: PendingIndex) -> Set[int]:
+    """
+    Дописывает в лист результаты, полученные от бота, но не записанные до перезапуска.
+    Результат применяется, только если строка всё ещё ждёт обработки и в ней тот же ИНН.
+    """
+    journal = get_row_journal()
+    replayed = set()
+    for entry in journal.unwritten():
+        pending = index.rows.get(entry.row)
+        if pending is None or normalize_inn(pending[1]) != normalize_inn(entry.inn):
+            # строку уже заполнили или лист пересортировали — результат к ней не относится
+            journal.mark_written([entry.row])
+            continue
+        try:
+            await writer.add(entry.row, entry.phones, entry.emails)
+        except SheetFlushError:
+            pass  # строки остались в буфере writer
+        replayed.add(entry.row)
+
+    if replayed:
+        logger.info(f"Из журнала восстановлено строк без повторного запроса к боту: {len(replayed)}")
+    return replayed
+
+
+async def build_row_queue(
+    index: Optional[PendingIndex] = None,
+    wks: Optional[AsyncWorksheet] = None,
+    writer: Optional[SheetBatchWriter] = None,
+) -> "asyncio.Queue[RowTask]":
+    """
+    Общая очередь строк для всех сессий, работающих параллельно.
+    index переиспользуется между циклами, чтобы не перечитывать весь лист каждый раз.
+    Если передан writer, сначала в него дописываются результаты из журнала — эти строки в очередь не попадают.
+    """
+    wks = wks or await get_worksheet()
+    await prepare_worksheet(wks)
+    if index is None:
+        index = build_pending_index()
+    await index.refresh(wks)
+
+    replayed = await replay_journal(writer, index) if writer is not None else set()
+
+    row_queue: asyncio.Queue = asyncio.Queue()
+    rows = 0
+    for task in index.tasks(exclude=replayed):
+        row_queue.put_nowait(task)
+        rows += len(task.rows)
+    QUEUE_DEPTH.set(row_queue.qsize())
+    # Строки с одинаковым ИНН обрабатываются одним запросом к боту
+    saved = rows - row_queue.qsize()
+    DEDUP_SAVED.inc(saved)
+    logger.info(f"В очереди {rows} строк для обработки, уникальных ИНН {row_queue.qsize()}: сэкономлено запросов {saved}")
+    return row_queue
+
+
+class LookupResult(NamedTuple):
+    """Результат поиска по одной паре ФИО + ИНН в том виде, в каком он пишется в таблицу."""
+    phones: str
+    emails: str
+    birthday: Optional[str]
+
+
+async def lookup_row(client: TelegramClient, chat, fio: str, inn: str) -> Union[LookupResult, str]:
+    """
+    Ищет телефоны и email по ИНН и, если стратегия разрешает, по ФИО + дате рождения (с кэшем ответов).
+    Возвращает текст ошибки, если сессия упёрлась в лимит или бан. Если бот не дал ответа, который можно записать,
+    бросает BotLookupError (или ConnectionError, NoReplyError): такой результат не кэшируется и не пишется как «не найден».
+    """
+    phone_numbers = []
+    cache = get_cache()
+
+    raw_data = cache.get_inn(inn)
+    CACHE_LOOKUPS.inc(kind="inn", result="miss" if raw_data is None else "hit")
+    if raw_data is None:
+        raw_data = await get_phone_numbers_raw_inn(client, chat, fio, inn)
+        phones = raw_data.get('phones')
+
+        if not isinstance(phones, list):
+            return phones
+        cache.put_inn(inn, raw_data)
+
+    phone_numbers.extend(raw_data['phones'])
+
+    if raw_data.get('birthday'):
+        planner = get_planner()
+        dr_phones = cache.get_fio_dr(fio, raw_data['birthday'])
+        CACHE_LOOKUPS.inc(kind="fio_dr", result="miss" if dr_phones is None else "hit")
+        # Из кэша второй ответ бесплатен; запрос к боту — только если его разрешает стратегия
+        if dr_phones is None and planner.should_query(raw_data['phones']):
+            try:
+                dr_phones = await get_phone_numbers_fio_dr(client, chat, fio, raw_data['birthday'])
+            except BotLookupError as e:
+                # Второй запрос необязателен: пишем то, что нашлось по /raw
+                logger.warning(f"Запрос по ФИО и дате рождения не удался, записываем ответ /raw: {e}")
+            else:
+                if not isinstance(dr_phones, str):
+                    cache.put_fio_dr(fio, raw_data['birthday'], dr_phones)
+                    planner.record(raw_data['phones'], dr_phones)
+
+        if dr_phones is None:
+            logger.debug(f"Запрос по ФИО и дате рождения пропущен или не удался (стратегия {planner.strategy})")
+        elif isinstance(dr_phones, str):
+            # Лимит на втором запросе: ответ /raw уже в кэше, строку доделает другая сессия
+            return dr_phones
+        else:
+            phone_numbers.extend(dr_phones)
+
+    # В кэше могут быть номера из старых ответов: с "+" и без фильтра по стране
+    phone_numbers = normalize_phones(phone_numbers)
+    phone_numbers_str = ', '.join(phone_numbers) if phone_numbers else "телефон не найден"
+
+    # Emails
+    emails = raw_data.get('emails', [])
+    emails_str = ', '.join(sorted(set(emails), key=str.lower)) if emails else "email не найден"
+
+    return LookupResult(phone_numbers_str, emails_str, raw_data.get('birthday'))
+
+
+async def process_row(
+    writer: SheetBatchWriter,
+    task: RowTask,
+    chat,
+    client: TelegramClient,
+    session_name: Optional[str] = None,
+) -> Optional[str]:
+    """
+    Обрабатывает одну строку вместе с её дублями по ИНН (task.duplicates): бот опрашивается один раз.
+    Возвращает текст ошибки, если сессия упёрлась в лимит или бан, иначе None.
+    """
+    index, current_fio, current_inn = task.row, task.fio, task.inn
+    journal = get_row_journal()
+    for row in task.rows:
+        journal.mark_queried(row, current_fio, current_inn, session_name)
+
+    # Этапы строки (запросы к боту, скачивание и разбор отчёта, запись) попадают в трассу для админки
+    with trace_row(task.rows, current_inn, session_name) as trace:
+        result = await lookup_row(client, chat, current_fio, current_inn)
+        if isinstance(result, str):
+            trace.result = STOPPED
+            return result
+        phone_numbers_str, emails_str = result.phones, result.emails
+
+        logger.info(f"Добавлены значения: {current_fio} {current_inn} - phones: {phone_numbers_str} | emails: {emails_str} | Поле {index}")
+        if task.duplicates:
+            logger.info(f"Тот же результат для строк с ИНН {current_inn}: {', '.join(map(str, task.duplicates))}")
+        for row in task.rows:
+            # METRIC: processed row
+            logger.info(
+                f"[METRIC] processed row={{'row': {row}, 'fio': '{current_fio}', 'inn': '{current_inn}', 'session': '{session_name or ''}'}}"
+            )
+            record_event(PROCESSED, session_name, row, current_inn, current_fio)
+            ROWS.inc(session=session_name or "", result=PROCESSED)
+            # Ответ сохраняем в журнал до записи: после перезапуска он будет дописан без повторного запроса
+            journal.mark_received(row, current_fio, current_inn, phone_numbers_str, emails_str, session_name)
+        # Для поиска в админке (/api/lookup) — один раз на ИНН, а не на каждую строку-дубль
+        get_result_store().add(
+            current_inn, current_fio, phone_numbers_str, emails_str, result.birthday, session_name, worksheet_name
+        )
+        # Обновляем обе колонки во всех строках с этим ИНН (запись уходит в таблицу одной пачкой)
+        with span("write"):
+            await writer.add_many(task.rows, phone_numbers_str, emails_str)
+        return None
 
 
 async def update_phones(
@@ -332,90 +485,89 @@ async def update_phones(
     client: TelegramClient,
     max_rows: Optional[int] = None,
     session_name: Optional[str] = None,
-) -> None:
-    wks = table.worksheet(worksheet_name)
-    fio_col_values = wks.col_values(FIO_COL)
-    inn_col_values = wks.col_values(INN_COL)
-    phone_col_values = wks.col_values(PHONE_COL)
-    # Читаем текущую колонку email для возможной валидации или будущего использования
-    try:
-        email_col_values = wks.col_values(EMAIL_COL)
-    except Exception:
-        # Если лист пуст в этой колонке — продолжим без чтения
-        email_col_values = []
-    # Установим заголовок для столбца email при необходимости
+    row_queue: Optional["asyncio.Queue[RowTask]"] = None,
+    writer: Optional[SheetBatchWriter] = None,
+) -> Optional[str]:
+    """
+    Обрабатывает строки из row_queue (общей для всех сессий) или, если очередь не передана, все незаполненные строки листа.
+    Результаты пишутся через writer; если он не передан, создаётся свой и сбрасывается в конце.
+    Возвращает текст ошибки, из-за которой сессия остановилась (лимит/бан), иначе None.
+    """
+    own_writer = writer is None
+    if own_writer:
+        wks = await get_worksheet()
+        index = build_pending_index() if row_queue is None else None
+        writer = build_writer(wks, index)
+        writer.start()
+        if row_queue is None:
+            row_queue = await build_row_queue(index, wks, writer)
+    elif row_queue is None:
+        row_queue = await build_row_queue()
+
     try:
-        header_email = wks.cell(1, EMAIL_COL).value
-        if not header_email or not header_email.strip():
-            wks.update_cell(1, EMAIL_COL, "Email")
-    except Exception:
-        pass
+        return await _process_queue(writer, row_queue, chat, client, max_rows, session_name)
+    finally:
+        if own_writer:
+            await writer.close()
+
 
-    index = 2
+async def _process_queue(
+    writer: SheetBatchWriter,
+    row_queue: "asyncio.Queue[RowTask]",
+    chat,
+    client: TelegramClient,
+    max_rows: Optional[int],
+    session_name: Optional[str],
+) -> Optional[str]:
+    scheduler = get_scheduler()
     processed = 0
-    while index <= len(inn_col_values):
+    while True:
+        if session_name and not scheduler.has_quota(session_name):
+            return "Исчерпана суточная квота сессии"
+
         try:
-            # Determine current cell values safely (lists can be shorter than total rows)
-            phone_cell = phone_col_values[index - 1] if index - 1 < len(phone_col_values) else ""
-            email_cell = email_col_values[index - 1] if index - 1 < len(email_col_values) else ""
-
-            # Process row if phone is missing OR email is missing
-            if (not phone_cell.strip()) or (not email_cell.strip()):
-                logger.debug(f"Шаг [{index}/{len(inn_col_values)}]")
-                current_fio = fio_col_values[index - 1]
-                current_inn = inn_col_values[index - 1]
-                phone_numbers = []
-
-                raw_data = await get_phone_numbers_raw_inn(client, chat, current_fio, current_inn)
-                phones = raw_data.get('phones')
-
-                if not isinstance(phones, list):
-                    logger.error(f"Ошибка не позволяющая работу сессии: {phones}")
-                    return None
-
-                phone_numbers.extend(phones)
-
-                if raw_data.get('birthday'):
-                    dr_phones = await get_phone_numbers_fio_dr(client, chat, current_fio, raw_data['birthday'])
-                    if isinstance(dr_phones, str):
-                        logger.warning(f"Не удалось получить телефоны по ФИО и дате рождения: {dr_phones}")
-                    else:
-                        phone_numbers.extend(dr_phones)
-
-                phone_numbers = [
-                    re.sub(r'^\+', '', number)
-                    for number in phone_numbers
-                    if not number.startswith('+380')
-                ]
-                phone_numbers_str = ', '.join(set(phone_numbers)) if phone_numbers else "телефон не найден"
-
-                # Emails
-                emails = raw_data.get('emails', [])
-                emails_str = ', '.join(sorted(set(emails), key=str.lower)) if emails else "email не найден"
-
-                # Обновляем обе колонки
-                wks.update_cell(index, PHONE_COL, phone_numbers_str)
-                wks.update_cell(index, EMAIL_COL, emails_str)
-                logger.info(f"Добавлены значения: {current_fio} {current_inn} - phones: {phone_numbers_str} | emails: {emails_str} | Поле {index}")
-                # METRIC: processed row
-                logger.info(
-                    f"[METRIC] processed row={{'row': {index}, 'fio': '{current_fio}', 'inn': '{current_inn}', 'session': '{session_name or ''}'}}"
-                )
-                await asyncio.sleep(generate_cooldown(True))
-                processed += 1
-                if max_rows is not None and processed >= max_rows:
-                    break
+            task = row_queue.get_nowait()
+        except asyncio.QueueEmpty:
+            break
+        QUEUE_DEPTH.set(row_queue.qsize())
+
+        logger.debug(f"Шаг [строка {task.row}, осталось в очереди {row_queue.qsize()}]")
+        try:
+            stop_reason = await process_row(writer, task, chat, client, session_name=session_name)
+            if stop_reason:
+                logger.error(f"Ошибка не позволяющая работу сессии: {stop_reason}")
+                # Возвращаем строку в очередь, чтобы её забрала другая сессия
+                row_queue.put_nowait(task)
+                return stop_reason
+
+            processed += 1
+            if max_rows is not None and processed >= max_rows:
+                break
+        except ConnectionError as e:
+            # Клиент не переподключился: строка не «не найдена», её заберёт другая сессия
+            logger.error(f"Нет соединения с Telegram: {e}")
+            row_queue.put_nowait(task)
+            return "Нет соединения с Telegram"
+        except NoReplyError as e:
+            # Ответа нет — строка остаётся незаполненной и будет запрошена в следующем цикле
+            logger.warning(f"{e}: строка {task.row} (ИНН {task.inn}) пропущена до следующего цикла")
+        except SheetFlushError as e:
+            # Результат строки уже в буфере и будет записан при следующем сбросе
+            logger.error(f"{e}")
+            processed += 1
+            if max_rows is not None and processed >= max_rows:
+                break
         except Exception:
             logger.exception("Ошибка при обработке строки")
             traceback.print_exc()
             try:
-                wks.update_cell(index, PHONE_COL, "ERROR")
-                wks.update_cell(index, EMAIL_COL, "ERROR")
-            except Exception:
+                await writer.add_many(task.rows, "ERROR", "ERROR")
+            except SheetFlushError:
                 pass
-            # METRIC: error row
-            logger.error(f"[METRIC] error row={{'row': {index}, 'session': '{session_name or ''}'}}")
-
-        index += 1
+            for row in task.rows:
+                # METRIC: error row
+                logger.error(f"[METRIC] error row={{'row': {row}, 'session': '{session_name or ''}'}}")
+                record_event(ERROR, session_name, row, task.inn, task.fio)
+                ROWS.inc(session=session_name or "", result=ERROR)
 
     return None
@@ -0,0 +1,210 @@
+import codecs
+import io
+import os
+import re
+
+from html.parser import HTMLParser
+from typing import BinaryIO, Dict, List, Optional, TextIO, Tuple, Union
+
+PHONE_PATTERN = re.compile(r'\+\d{9,15}')
+# Базовый паттерн email
+EMAIL_PATTERN = re.compile(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}")
+
+READ_CHUNK_SIZE = 64 * 1024
+
+# Путь к файлу, содержимое отчёта или открытый файл (текстовый или бинарный)
+ReportSource = Union[str, os.PathLike, bytes, bytearray, memoryview, BinaryIO, TextIO]
+
+
+class _Row:
+    __slots__ = ("left", "right")
+
+    def __init__(self):
+        self.left: Optional[List[str]] = None
+        self.right: Optional[List[str]] = None
+
+
+class _Card:
+    __slots__ = ("rows", "text")
+
+    def __init__(self):
+        self.rows: List[Tuple[str, str]] = []
+        self.text: List[str] = []
+
+
+class _ReportParser(HTMLParser):
+    """
+    Потоковый разбор HTML-отчёта бота за один проход.
+    Карточка (div.card) собирается из строк div.row с подписью div.row_left и значением div.row_right;
+    как только карточка закрыта, она разбирается и выбрасывается.
+    """
+
+    def __init__(self, target_fullname_norm: str):
+        super().__init__(convert_charrefs=True)
+        self.target_fullname_norm = target_fullname_norm
+        self.phones = set()
+        self.emails = set()
+        self.birthday: Optional[str] = None
+
+        self._divs: List[Optional[str]] = []  # роли открытых div: card / row / left / right / None
+        self._card: Optional[_Card] = None
+        self._row: Optional[_Row] = None
+        self._capture: Optional[List[str]] = None  # куда пишем текст подписи или значения
+        self._data: List[str] = []  # текст между тегами (может прийти кусками)
+
+    def handle_starttag(self, tag, attrs):
+        self._flush_data()
+        if tag != "div":
+            return
+
+        classes = ""
+        for name, value in attrs:
+            if name == "class":
+                classes = value or ""
+        classes = classes.split()
+
+        role = None
+        if self._card is None:
+            if "card" in classes:
+                role = "card"
+                self._card = _Card()
+        elif self._row is None:
+            if "row" in classes:
+                role = "row"
+                self._row = _Row()
+        elif self._capture is None:
+            # как find(): берём первую подпись и первое значение в строке
+            if "row_left" in classes and self._row.left is None:
+                role = "left"
+                self._row.left = self._capture = []
+            elif "row_right" in classes and self._row.right is None:
+                role = "right"
+                self._row.right = self._capture = []
+
+        self._divs.append(role)
+
+    def handle_endtag(self, tag):
+        self._flush_data()
+        if tag != "div" or not self._divs:
+            return
+
+        role = self._divs.pop()
+        if role in ("left", "right"):
+            self._capture = None
+        elif role == "row":
+            self._finish_row()
+            self._capture = None
+        elif role == "card":
+            self._finish_card(self._card)
+            self._card = None
+            self._row = None
+            self._capture = None
+
+    def handle_data(self, data):
+        self._data.append(data)
+
+    def close(self):
+        super().close()
+        self._flush_data()
+        # Обрезанный отчёт: незакрытые строка и карточка разбираются, как если бы теги были закрыты
+        if self._card is not None:
+            self._finish_row()
+            self._finish_card(self._card)
+            self._card = None
+            self._capture = None
+
+    def _flush_data(self):
+        if not self._data:
+            return
+        text = "".join(self._data)
+        self._data = []
+        if self._card is not None:
+            self._card.text.append(text)
+        if self._capture is not None:
+            self._capture.append(text)
+
+    def _finish_row(self):
+        row = self._row
+        if row is not None and row.left is not None and row.right is not None:
+            self._card.rows.append(("".join(row.left), "".join(row.right)))
+        self._row = None
+
+    def _finish_card(self, card: _Card):
+        fio_parts = {"фамилия": "", "имя": "", "отчество": ""}
+        full_name = ""
+        rows = [(left.strip().lower(), right.strip()) for left, right in card.rows]
+
+        for label, value in rows:
+            if "фио" in label:
+                full_name = value
+            elif "фамилия" in label:
+                fio_parts["фамилия"] = value
+            elif "имя" in label and "отчество" not in label:
+                fio_parts["имя"] = value
+            elif "отчество" in label:
+                fio_parts["отчество"] = value
+
+        if not full_name:
+            full_name = " ".join(fio_parts.values()).strip()
+
+        full_name_norm = re.sub(r'\s+', ' ', full_name.lower().strip())
+        if self.target_fullname_norm not in full_name_norm:
+            return
+
+        for label, value in rows:
+            if "телефон" in label:
+                for phone in re.split(r"[,\s]+", value):
+                    phone = phone.strip()
+                    if PHONE_PATTERN.fullmatch(phone):
+                        self.phones.add(phone)
+
+            # Email может быть под разными лейблами
+            elif ("email" in label) or ("e-mail" in label) or ("электрон" in label and "почт" in label):
+                self.emails.update(EMAIL_PATTERN.findall(value))
+            elif "дата рождения" in label and not self.birthday:
+                self.birthday = value
+
+        # На случай, если email указан где-то в блоке без явного лейбла
+        self.emails.update(EMAIL_PATTERN.findall(" ".join(card.text)))
+
+
+def _open_text(source: ReportSource) -> Tuple[TextIO, bool]:
+    """Текстовый поток для чтения отчёта и признак, что его нужно закрыть после чтения."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.TextIOWrapper(io.BytesIO(source), encoding="utf-8"), True
+    if isinstance(source, (str, os.PathLike)):
+        return open(source, "r", encoding="utf-8"), True
+    if isinstance(source.read(0), bytes):
+        # StreamReader, в отличие от TextIOWrapper, не закрывает чужой файл
+        return codecs.getreader("utf-8")(source), False
+    return source, False
+
+
+def get_phone_numbers_and_birthdate_from_html(
+    target_fullname: str, source: ReportSource
+) -> Dict[str, Union[List[str], Optional[str]]]:
+    """
+    Телефоны, email и дата рождения из карточек отчёта, в которых ФИО содержит target_fullname.
+    source — путь к файлу, байты отчёта или открытый файл. Отчёт читается кусками,
+    в памяти держится только текущая карточка.
+    """
+    target_fullname_norm = re.sub(r'\s+', ' ', target_fullname.lower().strip())
+    parser = _ReportParser(target_fullname_norm)
+
+    file, should_close = _open_text(source)
+    try:
+        while True:
+            chunk = file.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            parser.feed(chunk)
+    finally:
+        if should_close:
+            file.close()
+    parser.close()
+
+    return {
+        "phones": list(parser.phones),
+        "emails": list(parser.emails),
+        "birthday": parser.birthday,
+    }
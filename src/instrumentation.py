@@ -0,0 +1,206 @@
+import asyncio
+import functools
+import os
+import threading
+import time
+
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from src.storage import load_json_state, save_json_atomic
+
+SNAPSHOT_PATH = os.path.join("src", "instrumentation.json")
+SNAPSHOT_INTERVAL = 10  # как часто бот сохраняет снимок метрик для админки, секунды
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((name, "" if value is None else str(value)) for name, value in labels.items()))
+
+
+class _Metric(ABC):
+    type = ""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def snapshot(self) -> dict:
+        """Текущие значения для снимка, который читает админка."""
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            series = [{"labels": dict(key), "value": value} for key, value in self._values.items()]
+        return {"type": self.type, "help": self.help, "series": series}
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[LabelKey, Tuple[List[int], float, int]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            counts, total, count = self._values.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value, count + 1)
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            series = [
+                {"labels": dict(key), "buckets": list(counts), "sum": total, "count": count}
+                for key, (counts, total, count) in self._values.items()
+            ]
+        return {"type": self.type, "help": self.help, "bounds": list(self.buckets), "series": series}
+
+
+# Метрики бота
+ROWS = Counter("phoneparser_rows_total", "Обработанные строки листа по результату")
+BOT_REQUESTS = Counter("phoneparser_bot_requests_total", "Запросы к боту")
+FLOOD_WAITS = Counter("phoneparser_flood_waits_total", "Полученные FloodWaitError")
+CACHE_LOOKUPS = Counter("phoneparser_cache_lookups_total", "Обращения к кэшу ответов бота")
+QUOTA_REMAINING = Gauge("phoneparser_quota_remaining", "Остаток суточной квоты сессии")
+QUEUE_DEPTH = Gauge("phoneparser_queue_depth", "Строк в общей очереди")
+SESSION_RATE = Gauge("phoneparser_session_rate", "Текущая скорость запросов сессии, запросов в минуту")
+WRITER_BUFFER = Gauge("phoneparser_writer_buffer_rows", "Строк в буфере записи в таблицу")
+LOOKUP_LATENCY = Histogram("phoneparser_lookup_seconds", "Время поиска через бота целиком: ответ, отчёт, разбор")
+BOT_REPLY_LATENCY = Histogram("phoneparser_bot_reply_seconds", "Время от отправки запроса до полного ответа бота")
+MEDIA_DOWNLOAD_LATENCY = Histogram("phoneparser_media_download_seconds", "Время скачивания HTML-отчёта")
+HTML_PARSE_LATENCY = Histogram("phoneparser_html_parse_seconds", "Время разбора HTML-отчёта")
+FIO_DR_DECISIONS = Counter("phoneparser_fio_dr_decisions_total", "Решения о втором запросе (ФИО + ДР) по стратегиям")
+FIO_DR_NEW_PHONES = Counter("phoneparser_fio_dr_new_phones_total", "Новые номера, найденные вторым запросом")
+DEDUP_SAVED = Counter("phoneparser_dedup_saved_requests_total", "Запросы /raw, не отправленные благодаря одинаковым ИНН")
+SHEETS_RETRIES = Counter("phoneparser_sheets_retries_total", "Повторы запросов к Google Sheets после 429/5xx и обрывов связи")
+SHEETS_LATENCY = Histogram("phoneparser_sheets_request_seconds", "Время запросов к Google Sheets")
+
+METRICS: List[_Metric] = [
+    ROWS, BOT_REQUESTS, FLOOD_WAITS, CACHE_LOOKUPS, FIO_DR_DECISIONS, FIO_DR_NEW_PHONES, DEDUP_SAVED, SHEETS_RETRIES, QUOTA_REMAINING, QUEUE_DEPTH, SESSION_RATE, WRITER_BUFFER,
+    LOOKUP_LATENCY, BOT_REPLY_LATENCY, MEDIA_DOWNLOAD_LATENCY, HTML_PARSE_LATENCY, SHEETS_LATENCY,
+]
+
+
+class InstrumentedWorksheet:
+    """Обёртка над gspread.Worksheet, которая замеряет каждый вызов метода."""
+
+    def __init__(self, wks):
+        self._wks = wks
+
+    def __getattr__(self, name):
+        attr = getattr(self._wks, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        def timed(*args, **kwargs):
+            with SHEETS_LATENCY.time(op=name):
+                return attr(*args, **kwargs)
+
+        return timed
+
+
+def snapshot() -> dict:
+    return {"updated_at": time.time(), "metrics": {metric.name: metric.snapshot() for metric in METRICS}}
+
+
+def dump_snapshot(path: str = SNAPSHOT_PATH) -> None:
+    """Атомарно сохраняет снимок метрик, чтобы админка отдала его в /metrics."""
+    save_json_atomic(path, snapshot(), indent=None)
+
+
+async def run_snapshot_writer(interval: float = SNAPSHOT_INTERVAL) -> None:
+    while True:
+        try:
+            dump_snapshot()
+        except OSError:
+            pass
+        await asyncio.sleep(interval)
+
+
+def load_snapshot(path: str = SNAPSHOT_PATH) -> Optional[dict]:
+    return load_json_state(path)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str], extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels.items())
+    if extra:
+        items.append(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in items) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def render_prometheus(data: Optional[dict]) -> str:
+    """Снимок метрик в текстовом формате Prometheus (exposition format 0.0.4)."""
+    if not data:
+        return ""
+
+    out: List[str] = []
+    for name, metric in data.get("metrics", {}).items():
+        out.append(f"# HELP {name} {metric['help']}")
+        out.append(f"# TYPE {name} {metric['type']}")
+        for series in metric["series"]:
+            labels = series["labels"]
+            if metric["type"] != "histogram":
+                out.append(f"{name}{_format_labels(labels)} {_format_value(series['value'])}")
+                continue
+
+            for bound, count in zip(metric["bounds"], series["buckets"]):
+                out.append(f"{name}_bucket{_format_labels(labels, ('le', _format_value(bound)))} {count}")
+            out.append(f"{name}_bucket{_format_labels(labels, ('le', '+Inf'))} {series['count']}")
+            out.append(f"{name}_sum{_format_labels(labels)} {_format_value(series['sum'])}")
+            out.append(f"{name}_count{_format_labels(labels)} {series['count']}")
+
+    out.append("# HELP phoneparser_snapshot_timestamp_seconds Время снимка метрик бота")
+    out.append("# TYPE phoneparser_snapshot_timestamp_seconds gauge")
+    out.append(f"phoneparser_snapshot_timestamp_seconds {_format_value(data.get('updated_at', 0))}")
+    return "\n".join(out) + "\n"
@@ -0,0 +1,103 @@
+import os
+import time
+
+from typing import Iterable, List, NamedTuple, Optional
+
+from src.storage import connect
+from src.utils import logger
+
+JOURNAL_PATH = os.path.join("src", "journal.db")
+JOURNAL_KEEP = 7 * 24 * 60 * 60  # сколько хранить записи об уже записанных строках, секунды
+
+QUERIED = "queried"  # запрос к боту отправлен, ответа ещё нет
+RECEIVED = "received"  # ответ получен, в таблицу ещё не записан
+WRITTEN = "written"  # результат записан в таблицу
+
+
+class JournalEntry(NamedTuple):
+    row: int
+    fio: str
+    inn: str
+    phones: str
+    emails: str
+
+
+class RowJournal:
+    """
+    Журнал состояния строк листа на диске: queried -> received -> written.
+    После перезапуска результаты в состоянии received дописываются в лист без повторных запросов к боту.
+    """
+
+    def __init__(self, worksheet: str, path: str = JOURNAL_PATH):
+        self.worksheet = worksheet
+        self.conn = connect(path)
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS rows (
+                worksheet TEXT NOT NULL,
+                row INTEGER NOT NULL,
+                fio TEXT NOT NULL,
+                inn TEXT NOT NULL,
+                state TEXT NOT NULL,
+                phones TEXT,
+                emails TEXT,
+                session TEXT,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (worksheet, row)
+            );
+            CREATE INDEX IF NOT EXISTS rows_state ON rows (worksheet, state);
+            """
+        )
+        self.conn.execute(
+            "DELETE FROM rows WHERE state = ? AND updated_at < ?",
+            (WRITTEN, time.time() - JOURNAL_KEEP),
+        )
+
+    def mark_queried(self, row: int, fio: str, inn: str, session: Optional[str] = None) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO rows (worksheet, row, fio, inn, state, phones, emails, session, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, NULL, NULL, ?, ?)",
+            (self.worksheet, row, fio, inn, QUERIED, session, time.time()),
+        )
+
+    def mark_received(self, row: int, fio: str, inn: str, phones: str, emails: str, session: Optional[str] = None) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO rows (worksheet, row, fio, inn, state, phones, emails, session, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (self.worksheet, row, fio, inn, RECEIVED, phones, emails, session, time.time()),
+        )
+
+    def mark_written(self, rows: Iterable[int]) -> None:
+        now = time.time()
+        self.conn.executemany(
+            "UPDATE rows SET state = ?, updated_at = ? WHERE worksheet = ? AND row = ?",
+            [(WRITTEN, now, self.worksheet, row) for row in rows],
+        )
+
+    def unwritten(self) -> List[JournalEntry]:
+        """Строки, ответ по которым получен, но не записан в таблицу."""
+        cursor = self.conn.execute(
+            "SELECT row, fio, inn, phones, emails FROM rows WHERE worksheet = ? AND state = ? ORDER BY row",
+            (self.worksheet, RECEIVED),
+        )
+        return [JournalEntry(*item) for item in cursor.fetchall()]
+
+    def count(self, state: str) -> int:
+        (count,) = self.conn.execute(
+            "SELECT COUNT(*) FROM rows WHERE worksheet = ? AND state = ?", (self.worksheet, state)
+        ).fetchone()
+        return count
+
+
+_journals = {}
+
+
+def get_journal(worksheet: str) -> RowJournal:
+    journal = _journals.get(worksheet)
+    if journal is None:
+        journal = RowJournal(worksheet)
+        _journals[worksheet] = journal
+        interrupted = journal.count(QUERIED)
+        if interrupted:
+            logger.warning(f"В журнале {interrupted} строк, прерванных до ответа бота: они будут запрошены заново")
+    return journal
@@ -0,0 +1,119 @@
+import datetime as dt
+import os
+import random
+
+from typing import Dict, Iterable, Optional
+
+from src.instrumentation import FIO_DR_DECISIONS, FIO_DR_NEW_PHONES
+from src.storage import load_json_state, save_json_atomic
+from src.utils import logger
+
+STATS_PATH = os.path.join("src", "lookup_stats.json")
+
+ALWAYS = "always"  # второй запрос (ФИО + ДР) всегда, как раньше
+IF_NO_PHONES = "if_no_phones"  # только если /raw не нашёл телефонов
+ADAPTIVE = "adaptive"  # если /raw нашёл телефоны — только пока второй запрос в таких случаях приносит новые номера
+FIO_DR_STRATEGY = ALWAYS
+
+ADAPTIVE_MIN_YIELD = 0.1  # доля вторых запросов с новыми номерами, ниже которой adaptive их пропускает
+ADAPTIVE_MIN_SAMPLES = 30  # пока наблюдений меньше, adaptive запрашивает всегда
+ADAPTIVE_EXPLORE = 0.05  # доля запросов, которые adaptive всё равно отправляет, чтобы статистика не устаревала
+
+
+def _normalize_phone(phone: str) -> str:
+    return phone.strip().lstrip("+")
+
+
+class LookupPlanner:
+    """
+    Решает, нужен ли второй запрос к боту (ФИО + дата рождения) после /raw, и ведёт статистику по стратегиям:
+    сколько вторых запросов отправлено и пропущено и сколько новых уникальных номеров они дали.
+    Статистика разделена по тому, нашёл ли /raw телефоны, и сохраняется в STATS_PATH.
+    """
+
+    def __init__(self, strategy: Optional[str] = None, path: str = STATS_PATH):
+        strategy = strategy or FIO_DR_STRATEGY
+        if strategy not in (ALWAYS, IF_NO_PHONES, ADAPTIVE):
+            raise ValueError(f"Неизвестная стратегия второго запроса: {strategy}")
+        self.strategy = strategy
+        self.path = path
+        self.stats: Dict[str, Dict[str, int]] = self._load()
+
+    def should_query(self, raw_phones: Iterable[str]) -> bool:
+        context = self._context(raw_phones)
+        if self.strategy == ALWAYS or context == "no_phones":
+            query = True
+        elif self.strategy == IF_NO_PHONES:
+            query = False
+        else:
+            query = self._adaptive(context)
+
+        if not query:
+            self._bump(context, "skipped")
+            FIO_DR_DECISIONS.inc(strategy=self.strategy, decision="skipped")
+            self._save()
+        return query
+
+    def record(self, raw_phones: Iterable[str], dr_phones: Iterable[str]) -> int:
+        """Учитывает результат второго запроса; возвращает число номеров, которых не было в ответе /raw."""
+        raw = {_normalize_phone(p) for p in raw_phones}
+        new = len({_normalize_phone(p) for p in dr_phones} - raw)
+        context = self._context(raw)
+        self._bump(context, "sent")
+        self._bump(context, "new_phones", new)
+        if new:
+            self._bump(context, "rows_with_new")
+        FIO_DR_DECISIONS.inc(strategy=self.strategy, decision="sent")
+        FIO_DR_NEW_PHONES.inc(new, strategy=self.strategy)
+        self._save()
+        return new
+
+    def yield_rate(self, context: str) -> Optional[float]:
+        """Доля вторых запросов, принёсших новые номера, в этом контексте (с любой стратегией)."""
+        sent = sum(s.get("sent", 0) for key, s in self.stats.items() if key.endswith(f":{context}"))
+        if not sent:
+            return None
+        gained = sum(s.get("rows_with_new", 0) for key, s in self.stats.items() if key.endswith(f":{context}"))
+        return gained / sent
+
+    def summary(self) -> Dict[str, Dict[str, int]]:
+        return {key: dict(stats) for key, stats in sorted(self.stats.items())}
+
+    def _adaptive(self, context: str) -> bool:
+        sent = sum(s.get("sent", 0) for key, s in self.stats.items() if key.endswith(f":{context}"))
+        if sent < ADAPTIVE_MIN_SAMPLES or random.random() < ADAPTIVE_EXPLORE:
+            return True
+        return self.yield_rate(context) >= ADAPTIVE_MIN_YIELD
+
+    @staticmethod
+    def _context(raw_phones: Iterable[str]) -> str:
+        return "had_phones" if any(p.strip() for p in raw_phones) else "no_phones"
+
+    def _bump(self, context: str, field: str, amount: int = 1) -> None:
+        stats = self.stats.setdefault(f"{self.strategy}:{context}", {})
+        stats[field] = stats.get(field, 0) + amount
+
+    def _load(self) -> Dict[str, Dict[str, int]]:
+        warning = f"Не удалось прочитать {self.path}, статистика второго запроса начата заново"
+        data = load_json_state(self.path, {}, warning)
+        if not isinstance(data, dict):
+            logger.warning(warning)
+            return {}
+        return data.get("stats", {})
+
+    def _save(self) -> None:
+        data = {"stats": self.stats, "updated_at": dt.datetime.now().isoformat(timespec="seconds")}
+        try:
+            save_json_atomic(self.path, data)
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить статистику второго запроса: {e}")
+
+
+_planner: Optional[LookupPlanner] = None
+
+
+def get_planner() -> LookupPlanner:
+    global _planner
+    if _planner is None:
+        _planner = LookupPlanner()
+    return _planner
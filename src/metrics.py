@@ -1,34 +1,88 @@
 import datetime as dt
-import json
 import os
-from collections import Counter, defaultdict
-from typing import Any, Dict, List, Optional, Tuple
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from src.storage import connect
 
 LOG_PATH = os.path.join("src", "logs.log")
+METRICS_DB_PATH = os.path.join("src", "metrics.db")
 
+PROCESSED = "processed"
+ERROR = "error"
 
-def _parse_log_time(line: str) -> Optional[dt.datetime]:
-    # Format: 2025-08-16 13:22:26 | LEVEL    | line - message
-    try:
-        ts = line.split("|")[0].strip()
-        return dt.datetime.strptime(ts, "%Y-%m-%d %H:%M:%S")
-    except Exception:
-        return None
+AGGREGATE_INTERVAL = 2  # как часто агрегатор дочитывает новые события, секунды
+AGGREGATE_BATCH = 5000  # событий за один запрос
+SUMMARY_DAYS = 7  # сколько дней назад смотрит сводка
 
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    day TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    session TEXT NOT NULL,
+    row INTEGER,
+    inn TEXT,
+    fio TEXT
+);
+CREATE INDEX IF NOT EXISTS events_ts ON events (ts);
+CREATE INDEX IF NOT EXISTS events_day_kind ON events (day, kind);
+CREATE INDEX IF NOT EXISTS events_session_ts ON events (session, ts);
+"""
 
-def _iter_metric_lines() -> List[Tuple[dt.datetime, str]]:
-    if not os.path.exists(LOG_PATH):
-        return []
-    out: List[Tuple[dt.datetime, str]] = []
-    with open(LOG_PATH, "r", encoding="utf-8") as f:
-        for line in f:
-            if "[METRIC]" not in line:
-                continue
-            t = _parse_log_time(line)
-            if not t:
-                continue
-            out.append((t, line.rstrip()))
-    return out
+_writer: Optional[sqlite3.Connection] = None
+
+
+def _connect(path: str = METRICS_DB_PATH) -> sqlite3.Connection:
+    conn = connect(path)
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def record_event(
+    kind: str,
+    session: Optional[str] = None,
+    row: Optional[int] = None,
+    inn: Optional[str] = None,
+    fio: Optional[str] = None,
+) -> None:
+    """Добавляет событие (processed / error) в хранилище метрик."""
+    global _writer
+    if _writer is None:
+        _writer = _connect()
+    now = time.time()
+    _writer.execute(
+        "INSERT INTO events (ts, day, kind, session, row, inn, fio) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (now, dt.date.fromtimestamp(now).isoformat(), kind, session or "unknown", row, inn, fio),
+    )
+
+
+def window_counts(since: dt.datetime, until: Optional[dt.datetime] = None) -> Dict[str, Any]:
+    """Обработано и ошибок за произвольное окно времени, всего и по сессиям."""
+    until = until or dt.datetime.now()
+    conn = _connect()
+    try:
+        rows = conn.execute(
+            "SELECT kind, session, COUNT(*) AS n FROM events WHERE ts >= ? AND ts < ? GROUP BY kind, session",
+            (since.timestamp(), until.timestamp()),
+        ).fetchall()
+    finally:
+        conn.close()
+
+    result = {"since": since.isoformat(), "until": until.isoformat(), "processed": 0, "errors": 0,
+              "sessions": Counter(), "session_errors": Counter()}
+    for row in rows:
+        if row["kind"] == PROCESSED:
+            result["processed"] += row["n"]
+            result["sessions"][row["session"]] += row["n"]
+        elif row["kind"] == ERROR:
+            result["errors"] += row["n"]
+            result["session_errors"][row["session"]] += row["n"]
+    return result
 
 
 def summarize() -> Dict[str, Any]:
@@ -37,7 +91,26 @@ def summarize() -> Dict[str, Any]:
     yesterday = today - dt.timedelta(days=1)
     week_ago = today - dt.timedelta(days=7)
 
-    lines = _iter_metric_lines()
+    conn = _connect()
+    try:
+        per_day = conn.execute(
+            "SELECT day, kind, COUNT(*) AS n FROM events WHERE day >= ? GROUP BY day, kind",
+            (week_ago.isoformat(),),
+        ).fetchall()
+        per_session = conn.execute(
+            "SELECT session, COUNT(*) AS n FROM events WHERE kind = ? AND day >= ? GROUP BY session",
+            (PROCESSED, week_ago.isoformat()),
+        ).fetchall()
+        per_session_errors = conn.execute(
+            "SELECT session, COUNT(*) AS n FROM events WHERE kind = ? AND day = ? GROUP BY session",
+            (ERROR, today.isoformat()),
+        ).fetchall()
+        errors_by_row = conn.execute(
+            "SELECT row, COUNT(*) AS n FROM events WHERE kind = ? AND day = ? GROUP BY row",
+            (ERROR, today.isoformat()),
+        ).fetchall()
+    finally:
+        conn.close()
 
     counts = {
         "today": 0,
@@ -45,56 +118,270 @@ def summarize() -> Dict[str, Any]:
         "week": 0,
         "errors_today": 0,
     }
-
-    per_session = Counter()
-    per_session_errors = Counter()
-    errors_by_row = Counter()
-
-    for ts, line in lines:
-        date = ts.date()
-        if "processed row=" in line:
-            if date >= week_ago:
-                counts["week"] += 1
-            if date == today:
-                counts["today"] += 1
-            if date == yesterday:
-                counts["yesterday"] += 1
-            try:
-                payload = line.split("[METRIC]", 1)[1]
-                js = payload.split("row=", 1)[1]
-                js = js[js.find("{") : js.rfind("}") + 1]
-                data = json.loads(js.replace("'", '"'))
-                session = data.get("session") or "unknown"
-                per_session[session] += 1
-            except Exception:
-                pass
-        elif "error row=" in line:
-            if date == today:
-                counts["errors_today"] += 1
-            try:
-                payload = line.split("[METRIC]", 1)[1]
-                if "row={" in payload:
-                    js = payload.split("row=", 1)[1]
-                    js = js[js.find("{") : js.rfind("}") + 1]
-                    data = json.loads(js.replace("'", '"'))
-                    errors_by_row[data.get("row", 0)] += 1
-                    session = data.get("session") or "unknown"
-                    per_session_errors[session] += 1
-            except Exception:
-                pass
+    for row in per_day:
+        day = dt.date.fromisoformat(row["day"])
+        if row["kind"] == PROCESSED:
+            counts["week"] += row["n"]
+            if day == today:
+                counts["today"] += row["n"]
+            if day == yesterday:
+                counts["yesterday"] += row["n"]
+        elif row["kind"] == ERROR and day == today:
+            counts["errors_today"] += row["n"]
 
     return {
         "counts": counts,
-    "sessions": per_session,
-    "session_errors": per_session_errors,
-        "errors_by_row": errors_by_row,
+        "sessions": Counter({row["session"]: row["n"] for row in per_session}),
+        "session_errors": Counter({row["session"]: row["n"] for row in per_session_errors}),
+        "errors_by_row": Counter({row["row"] or 0: row["n"] for row in errors_by_row}),
         "updated_at": now.isoformat(),
     }
 
 
+class SummaryAggregator:
+    """
+    Сводка для дашборда, которая считается инкрементально в фоновом потоке.
+    Запоминает id последнего прочитанного события и inode файла хранилища, дочитывает только новые события
+    и держит в памяти счётчики по дням и сессиям. Если файл хранилища заменили или он начался заново,
+    счётчики пересобираются. summary() не обращается к базе.
+    """
+
+    def __init__(self, path: str = METRICS_DB_PATH, interval: float = AGGREGATE_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._reset(None)
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="metrics-aggregator", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval * 2)
+            self._thread = None
+
+    def poll(self) -> int:
+        """Дочитывает новые события. Возвращает, сколько событий обработано."""
+        if not os.path.exists(self.path):
+            return 0
+
+        inode = os.stat(self.path).st_ino
+        if self._conn is None or inode != self._inode:
+            self._reopen(inode)
+
+        (max_id,) = self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()
+        if max_id < self._last_id:
+            # хранилище начали заново — пересобираем счётчики
+            self._reopen(inode)
+
+        total = 0
+        while True:
+            rows = self._conn.execute(
+                "SELECT id, day, kind, session, row FROM events WHERE id > ? ORDER BY id LIMIT ?",
+                (self._last_id, AGGREGATE_BATCH),
+            ).fetchall()
+            if not rows:
+                break
+            with self._lock:
+                for row in rows:
+                    self._add(row["day"], row["kind"], row["session"], row["row"])
+                self._last_id = rows[-1]["id"]
+            total += len(rows)
+
+        self._prune()
+        return total
+
+    def summary(self) -> Dict[str, Any]:
+        now = dt.datetime.now()
+        today = now.date().isoformat()
+        yesterday = (now.date() - dt.timedelta(days=1)).isoformat()
+        week_ago = (now.date() - dt.timedelta(days=SUMMARY_DAYS)).isoformat()
+
+        with self._lock:
+            per_day = dict(self._per_day)
+            per_session = dict(self._per_session)
+            errors_by_row = Counter(self._errors_by_row.get(today, {}))
+
+        sessions = Counter()
+        session_errors = Counter()
+        for (day, kind, session), n in per_session.items():
+            if kind == PROCESSED and day >= week_ago:
+                sessions[session] += n
+            elif kind == ERROR and day == today:
+                session_errors[session] += n
+
+        return {
+            "counts": {
+                "today": per_day.get((today, PROCESSED), 0),
+                "yesterday": per_day.get((yesterday, PROCESSED), 0),
+                "week": sum(n for (day, kind), n in per_day.items() if kind == PROCESSED and day >= week_ago),
+                "errors_today": per_day.get((today, ERROR), 0),
+            },
+            "sessions": sessions,
+            "session_errors": session_errors,
+            "errors_by_row": errors_by_row,
+            "updated_at": now.isoformat(),
+        }
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except sqlite3.Error:
+                # база может быть временно недоступна — попробуем на следующем шаге
+                self._conn = None
+            self._stop.wait(self.interval)
+
+    def _reopen(self, inode: int) -> None:
+        if self._conn is not None:
+            self._conn.close()
+        self._conn = _connect(self.path)
+        self._reset(inode)
+        # Старше окна сводки события не нужны
+        start = dt.datetime.combine(dt.date.today() - dt.timedelta(days=SUMMARY_DAYS), dt.time())
+        first_id, max_id = self._conn.execute(
+            "SELECT MIN(id), (SELECT COALESCE(MAX(id), 0) FROM events) FROM events WHERE ts >= ?", (start.timestamp(),)
+        ).fetchone()
+        # Если в окне событий нет, читать нечего: продолжаем с последнего id, а не со всей таблицы
+        self._last_id = first_id - 1 if first_id is not None else max_id
+
+    def _reset(self, inode: Optional[int]) -> None:
+        with self._lock:
+            self._inode = inode
+            self._last_id = 0
+            self._per_day: Counter = Counter()  # (день, вид) -> количество
+            self._per_session: Counter = Counter()  # (день, вид, сессия) -> количество
+            self._errors_by_row: Dict[str, Counter] = {}  # день -> строка -> количество ошибок
+
+    def _add(self, day: str, kind: str, session: str, row: Optional[int]) -> None:
+        self._per_day[(day, kind)] += 1
+        self._per_session[(day, kind, session)] += 1
+        if kind == ERROR:
+            self._errors_by_row.setdefault(day, Counter())[row or 0] += 1
+
+    def _prune(self) -> None:
+        oldest = (dt.date.today() - dt.timedelta(days=SUMMARY_DAYS)).isoformat()
+        with self._lock:
+            for key in [key for key in self._per_day if key[0] < oldest]:
+                del self._per_day[key]
+            for key in [key for key in self._per_session if key[0] < oldest]:
+                del self._per_session[key]
+            for day in [day for day in self._errors_by_row if day < oldest]:
+                del self._errors_by_row[day]
+
+
+TAIL_BLOCK_SIZE = 8192
+LOG_LEVELS = {"TRACE": 5, "DEBUG": 10, "INFO": 20, "SUCCESS": 25, "WARNING": 30, "ERROR": 40, "CRITICAL": 50}
+
+
+def _read_tail(path: str, n: int, end: Optional[int] = None) -> bytes:
+    """Конец файла до позиции end (по умолчанию до конца), в котором не меньше n строк; читается блоками с конца."""
+    with open(path, "rb") as f:
+        position = f.seek(0, os.SEEK_END) if end is None else end
+        data = b""
+        # n + 1 переводов строки: последняя строка файла тоже заканчивается переводом
+        while position > 0 and data.count(b"\n") <= n:
+            step = min(TAIL_BLOCK_SIZE, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+    return data
+
+
 def tail(n: int = 200) -> List[str]:
-    if not os.path.exists(LOG_PATH):
+    """Последние n строк лога: файл читается блоками с конца, а не целиком."""
+    if n <= 0 or not os.path.exists(LOG_PATH):
         return []
-    with open(LOG_PATH, "r", encoding="utf-8") as f:
-        lines = f.readlines()
+    lines = _read_tail(LOG_PATH, n).decode("utf-8", errors="replace").splitlines(keepends=True)
     return lines[-n:]
+
+
+def log_line_matches(line: str, level: Optional[str] = None, session: Optional[str] = None) -> bool:
+    """
+    Фильтр строки лога: level — минимальный уровень (WARNING покажет WARNING, ERROR и CRITICAL),
+    session — имя сессии из третьего поля строки.
+    Формат: 2025-08-16 13:22:26 | INFO     | session1 | 120 - сообщение
+    """
+    if not level and not session:
+        return True
+    parts = line.split(" | ", 3)
+    if len(parts) < 3:
+        # продолжение многострочного сообщения (traceback) — показываем без фильтра по сессии
+        return not session
+    if level:
+        line_level = LOG_LEVELS.get(parts[1].strip().upper(), 0)
+        if line_level < LOG_LEVELS.get(level.upper(), 0):
+            return False
+    if session:
+        if len(parts) < 4 or parts[2].strip() != session:
+            return False
+    return True
+
+
+class LogFollower:
+    """
+    Следит за логом как tail -F: помнит смещение и inode прочитанного файла и отдаёт только новые полные строки.
+    Ротацию (новый inode или файл стал короче) переживает, начиная новый файл с начала.
+    """
+
+    def __init__(self, path: str = LOG_PATH, from_end: bool = True):
+        self.path = path
+        self.inode: Optional[int] = None
+        self.offset = 0
+        self._partial = b""
+        if from_end and os.path.exists(path):
+            stat = os.stat(path)
+            self.inode = stat.st_ino
+            self.offset = stat.st_size
+
+    def tail(self, n: int) -> List[str]:
+        """
+        Последние n полных строк лога. read_new продолжит ровно с того места, где они закончились,
+        так что строки, дописанные между этими вызовами, не повторятся и не потеряются.
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return []
+        self.inode = stat.st_ino
+        self.offset = stat.st_size
+        self._partial = b""
+        if n <= 0:
+            return []
+
+        data = _read_tail(self.path, n, end=stat.st_size)
+        # Недописанная строка достанется read_new целиком
+        complete, newline, self._partial = data.rpartition(b"\n")
+        if not newline:
+            return []
+        return (complete + b"\n").decode("utf-8", errors="replace").splitlines(keepends=True)[-n:]
+
+    def read_new(self) -> List[str]:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return []
+
+        if stat.st_ino != self.inode or stat.st_size < self.offset:
+            self.inode = stat.st_ino
+            self.offset = 0
+            self._partial = b""
+        if stat.st_size == self.offset:
+            return []
+
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read(stat.st_size - self.offset)
+        self.offset += len(data)
+
+        data = self._partial + data
+        complete, newline, self._partial = data.rpartition(b"\n")
+        if not newline:
+            return []
+        return (complete + b"\n").decode("utf-8", errors="replace").splitlines(keepends=True)
@@ -0,0 +1,123 @@
+import asyncio
+import datetime as dt
+import os
+import random
+import time
+
+from typing import Dict, Optional
+
+from src.instrumentation import SESSION_RATE
+from src.storage import load_json_state, save_json_atomic
+from src.utils import logger
+
+PACING_PATH = os.path.join("src", "pacing.json")
+INITIAL_RATE = 1.5  # запросов в минуту для новой сессии
+MIN_RATE = 0.2
+MAX_RATE = 10.0
+RATE_INCREASE = 0.05  # аддитивный рост после каждого успешного ответа, запросов в минуту
+RATE_DECREASE = 0.5  # мультипликативное снижение после FloodWait или сообщения о блокировке
+BURST = 1  # сколько запросов подряд можно отправить без паузы
+PACING_JITTER = 0.2  # разброс паузы, доля от интервала
+
+
+def _load_rates() -> Dict[str, dict]:
+    return load_json_state(PACING_PATH, {}, f"Не удалось прочитать {PACING_PATH}, начинаем с начальной скорости")
+
+
+def _save_rate(session_name: str, rate: float) -> None:
+    rates = _load_rates()
+    rates[session_name] = {"rate": round(rate, 4), "updated_at": dt.datetime.now().isoformat(timespec="seconds")}
+    save_json_atomic(PACING_PATH, rates)
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket на одну сессию со скоростью, подстраиваемой по AIMD:
+    каждый успешный ответ бота немного поднимает скорость, FloodWaitError и сообщения о блокировке
+    снижают её в RATE_DECREASE раз. Выученная скорость сохраняется в PACING_PATH.
+    """
+
+    def __init__(self, session_name: str, rate: float = INITIAL_RATE):
+        self.session_name = session_name
+        self._rate = min(MAX_RATE, max(MIN_RATE, rate))
+        SESSION_RATE.set(self._rate, session=session_name)
+        self._tokens = float(BURST)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    @property
+    def rate(self) -> float:
+        """Текущая скорость, запросов в минуту."""
+        return self._rate
+
+    @property
+    def interval(self) -> float:
+        """Средняя пауза между запросами при текущей скорости, секунды."""
+        return 60 / self._rate
+
+    async def acquire(self) -> None:
+        """Ждёт, пока можно отправить следующий запрос."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                wait = max(self._blocked_until - now, 0.0)
+                if not wait and self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                if not wait:
+                    wait = (1 - self._tokens) * self.interval
+                    wait *= 1 + random.uniform(-PACING_JITTER, PACING_JITTER)
+
+                logger.debug(f"Пауза перед запросом {wait:.1f} сек. (скорость {self._rate:.2f} запр/мин)")
+                await asyncio.sleep(wait)
+
+    def on_success(self) -> None:
+        self._set_rate(self._rate + RATE_INCREASE)
+
+    def on_flood_wait(self, seconds: int) -> None:
+        """Telegram попросил подождать: не шлём ничего seconds секунд и снижаем скорость."""
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+        self._set_rate(self._rate * RATE_DECREASE)
+        logger.warning(f"FloodWait {seconds} сек., скорость снижена до {self._rate:.2f} запр/мин")
+
+    def on_limit(self) -> None:
+        """Бот ответил сообщением о блокировке. Дневной лимит сюда не относится — он не про скорость."""
+        self._tokens = 0.0
+        self._set_rate(self._rate * RATE_DECREASE)
+        logger.warning(f"Сообщение о блокировке, скорость снижена до {self._rate:.2f} запр/мин")
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(float(BURST), self._tokens + (now - self._updated) * self._rate / 60)
+        self._updated = now
+
+    def _set_rate(self, rate: float) -> None:
+        self._refill(time.monotonic())
+        self._rate = min(MAX_RATE, max(MIN_RATE, rate))
+        SESSION_RATE.set(self._rate, session=self.session_name)
+        try:
+            _save_rate(self.session_name, self._rate)
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить скорость сессии {self.session_name}: {e}")
+
+
+_limiters: Dict[str, AdaptiveRateLimiter] = {}
+
+
+def get_limiter(session_name: str) -> AdaptiveRateLimiter:
+    limiter = _limiters.get(session_name)
+    if limiter is None:
+        saved = _load_rates().get(session_name) or {}
+        limiter = AdaptiveRateLimiter(session_name, saved.get("rate", INITIAL_RATE))
+        _limiters[session_name] = limiter
+    return limiter
+
+
+def session_name_of(client) -> Optional[str]:
+    """Имя сессии по файлу .session клиента ("sessions/session1.session" -> "session1")."""
+    filename = getattr(client.session, "filename", None)
+    if not filename:
+        return None
+    return os.path.splitext(os.path.basename(filename))[0]
@@ -0,0 +1,131 @@
+import time
+
+from typing import Collection, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from gspread.utils import rowcol_to_a1
+
+from src.result_cache import normalize_inn
+from src.utils import logger
+
+SCAN_CHUNK_ROWS = 5000  # строк листа за один запрос при сканировании
+FULL_RESCAN_INTERVAL = 6 * 60 * 60  # полный проход по листу не чаще, чем раз в столько секунд
+
+
+class RowTask(NamedTuple):
+    """
+    Строка листа, ожидающая обработки. В duplicates — другие ожидающие строки с тем же ИНН:
+    бот опрашивается один раз, результат записывается во все строки.
+    """
+    row: int
+    fio: str
+    inn: str
+    duplicates: Tuple[int, ...] = ()
+
+    @property
+    def rows(self) -> Tuple[int, ...]:
+        return (self.row,) + self.duplicates
+
+
+class PendingIndex:
+    """
+    Индекс строк листа, у которых не заполнен телефон или email.
+    Лист читается диапазонами по SCAN_CHUNK_ROWS строк, в памяти хранятся только ожидающие строки.
+    Между полными проходами дочитываются только новые строки в конце листа,
+    а записанные строки убираются из индекса через mark_done.
+    Столбец ИНН перечитывается при каждом обновлении: если строки вставили, удалили или пересортировали,
+    индекс строится заново, чтобы результаты не ушли в чужие строки.
+    """
+
+    def __init__(self, fio_col: int, inn_col: int, phone_col: int, email_col: int, chunk_rows: int = SCAN_CHUNK_ROWS):
+        self.fio_col = fio_col
+        self.inn_col = inn_col
+        self.phone_col = phone_col
+        self.email_col = email_col
+        self.chunk_rows = chunk_rows
+        self.rows: Dict[int, Tuple[str, str]] = {}  # строка -> (ФИО, ИНН)
+        self.last_row = 1  # последняя строка с ИНН, которую мы видели
+        self._inns: List[str] = []  # ИНН строк листа начиная со 2-й, как их видел последний проход
+        self._last_full_scan: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __contains__(self, row: int) -> bool:
+        return row in self.rows
+
+    async def refresh(self, wks, full: Optional[bool] = None) -> None:
+        """
+        Обновляет индекс по листу wks (AsyncWorksheet). По умолчанию полный проход делается раз в FULL_RESCAN_INTERVAL,
+        в остальное время читаются только строки после last_row.
+        """
+        if full is None:
+            full = self._last_full_scan is None or time.monotonic() - self._last_full_scan >= FULL_RESCAN_INTERVAL
+        if not full and await self._inns_changed(wks):
+            logger.warning("Строки листа сдвинулись (вставка, удаление или сортировка): индекс строится заново")
+            full = True
+
+        if full:
+            self.rows = {}
+            self.last_row = 1
+            self._inns = []
+            await self._scan(wks, 2)
+            self._last_full_scan = time.monotonic()
+        else:
+            await self._scan(wks, self.last_row + 1)
+
+        logger.info(f"Индекс строк обновлён ({'полный проход' if full else 'новые строки'}): ожидают обработки {len(self.rows)}")
+
+    def mark_done(self, rows: Iterable[int]) -> None:
+        for row in rows:
+            self.rows.pop(row, None)
+
+    def tasks(self, exclude: Collection[int] = ()) -> List[RowTask]:
+        """Задачи по одной на ИНН (первая строка — основная, остальные в duplicates), кроме строк из exclude."""
+        groups: Dict[str, List[int]] = {}
+        for row, (fio, inn) in sorted(self.rows.items()):
+            if row in exclude:
+                continue
+            # Строка без цифр в ИНН остаётся отдельной задачей
+            groups.setdefault(normalize_inn(inn) or f"row:{row}", []).append(row)
+
+        return [
+            RowTask(rows[0], *self.rows[rows[0]], duplicates=tuple(rows[1:]))
+            for rows in sorted(groups.values())
+        ]
+
+    async def _inns_changed(self, wks) -> bool:
+        """Сверяет столбец ИНН (строки 2..last_row) с тем, что видел последний проход; один запрос на один столбец."""
+        if self.last_row < 2:
+            return False
+        values = await wks.get(f"{rowcol_to_a1(2, self.inn_col)}:{rowcol_to_a1(self.last_row, self.inn_col)}")
+        current = [cells[0].strip() if cells else "" for cells in values]
+        current += [""] * (self.last_row - 1 - len(current))
+        return current != self._inns[:self.last_row - 1]
+
+    async def _scan(self, wks, start_row: int) -> None:
+        first_col = min(self.fio_col, self.inn_col, self.phone_col, self.email_col)
+        last_col = max(self.fio_col, self.inn_col, self.phone_col, self.email_col)
+        row_count = wks.row_count
+
+        for chunk_start in range(start_row, row_count + 1, self.chunk_rows):
+            chunk_end = min(chunk_start + self.chunk_rows - 1, row_count)
+            values = await wks.get(f"{rowcol_to_a1(chunk_start, first_col)}:{rowcol_to_a1(chunk_end, last_col)}")
+
+            for offset, cells in enumerate(values):
+                row = chunk_start + offset
+                fio, inn, phone, email = (
+                    cells[col - first_col] if col - first_col < len(cells) else ""
+                    for col in (self.fio_col, self.inn_col, self.phone_col, self.email_col)
+                )
+                if len(self._inns) < row - 1:
+                    self._inns.extend([""] * (row - 1 - len(self._inns)))
+                self._inns[row - 2] = inn.strip()
+                if not inn.strip():
+                    continue
+
+                self.last_row = max(self.last_row, row)
+                # Строка ждёт обработки, если не заполнен телефон ИЛИ email
+                if not phone.strip() or not email.strip():
+                    self.rows[row] = (fio, inn)
+                else:
+                    self.rows.pop(row, None)
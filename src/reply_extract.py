@@ -0,0 +1,137 @@
+import functools
+import re
+
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+# Ответы бота, после которых сессия до сброса квоты бесполезна: шаблон и текст, который возвращается вместо телефонов
+LIMIT_PATTERNS = (
+    (r"услов\w*.*бот.*подписк", "Условием данного бота является подписка на"),
+    (r"уч[её]тн\w*.запис\w*.*заблок", "Учетная запись заблокирована"),
+    (r"ваш\w*.*аккаунт\w*.*заблок", "Ваш аккаунт был заблокирован"),
+    (r"исчерпал\w*.*лимит\w*.*запрос", "Превышен дневной лимит запросов"),
+)
+# Только блокировка, как и FloodWait, говорит о слишком частых запросах; дневной лимит и подписка — нет
+BAN_TEXTS = ("Учетная запись заблокирована", "Ваш аккаунт был заблокирован")
+NOT_FOUND_TEXT = "ничего не найдено"
+# Номера с этими кодами стран отбрасываются (без "+")
+EXCLUDED_PHONE_PREFIXES = ("380",)
+SCAN_CACHE_SIZE = 1024  # текст одного сообщения смотрят и сборщик ответа, и _ask_bot, и поиск — сканируется он один раз
+
+EMAIL_LOCAL_MAX = 64  # длина имени в адресе, дальше «@» назад не ищем
+
+
+def _limit_branches():
+    """
+    Шаблон лимита начинается с буквы: ветка на каждый её регистр, остальное без учёта регистра.
+    Так каждая ветка общего выражения начинается с конкретного символа, и re пропускает позиции,
+    с которых совпадение начаться не может, не пробуя ветки.
+    """
+    for i, (pattern, _) in enumerate(LIMIT_PATTERNS):
+        first, rest = pattern[0], pattern[1:]
+        for case, letter in enumerate((first.lower(), first.upper())):
+            yield f"limit{i}_{case}", i, f"{letter}(?i:{rest})"
+
+
+_LIMIT_GROUPS = {name: index for name, index, _ in _limit_branches()}
+# Все шаблоны одним выражением: текст проходится один раз, вид совпадения — по имени последней группы.
+# Email ищется от «@», имя перед ним добирается _EMAIL_LOCAL
+_SCANNER = re.compile("|".join([
+    r"\+(?P<phone>\d{9,15})",
+    r"@(?P<email>[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})",
+    r"Дат(?:ы|а) рождения:\s*[\n\r│├└─]*\s*(?P<birthday>\d{2}\.\d{2}\.\d{4})",
+    f"{NOT_FOUND_TEXT}(?P<not_found>)",
+    *(f"{pattern}(?P<{name}>)" for name, _, pattern in _limit_branches()),
+]))
+_EMAIL_LOCAL = re.compile(r"[a-zA-Z0-9._%+-]+\Z")
+
+
+class TextData(NamedTuple):
+    """Что нашлось в тексте одного сообщения; телефоны — без "+" и без фильтра по стране."""
+    phones: Tuple[str, ...]
+    emails: Tuple[str, ...]
+    birthday: Optional[str]
+    limit: Optional[str]
+    not_found: bool
+
+
+class ReplyData(NamedTuple):
+    """Ответ бота целиком: телефоны без "+" и без дублей, с фильтром по стране; limit — текст ошибки лимита или бана."""
+    phones: List[str]
+    emails: List[str]
+    birthday: Optional[str]
+    limit: Optional[str]
+    not_found: bool
+
+
+def _scan(text: str) -> TextData:
+    phones, emails = [], []
+    birthday = None
+    limit_index = None
+    not_found = False
+    for match in _SCANNER.finditer(text):
+        group = match.lastgroup
+        if group == "phone":
+            phones.append(match.group("phone"))
+        elif group == "email":
+            local = _EMAIL_LOCAL.search(text, max(0, match.start() - EMAIL_LOCAL_MAX), match.start())
+            if local:
+                emails.append(f"{local.group()}@{match.group('email')}")
+        elif group == "birthday":
+            # Как и раньше, берётся первая дата рождения в сообщении
+            birthday = birthday or match.group("birthday")
+        elif group == "not_found":
+            not_found = True
+        else:
+            index = _LIMIT_GROUPS[group]
+            limit_index = index if limit_index is None else min(limit_index, index)
+    limit = LIMIT_PATTERNS[limit_index][1] if limit_index is not None else None
+    return TextData(tuple(phones), tuple(emails), birthday, limit, not_found)
+
+
+scan_text = functools.lru_cache(maxsize=SCAN_CACHE_SIZE)(_scan)
+
+
+def normalize_phones(phones: Iterable[str], excluded: Optional[Iterable[str]] = None) -> List[str]:
+    """Номера без "+" и пробелов, без дублей (в порядке появления), без номеров с кодами стран из excluded."""
+    excluded = tuple(EXCLUDED_PHONE_PREFIXES if excluded is None else excluded)
+    result = {}
+    for phone in phones:
+        phone = phone.strip().lstrip("+")
+        if phone and not phone.startswith(excluded):
+            result[phone] = None
+    return list(result)
+
+
+def extract_reply(messages, excluded: Optional[Iterable[str]] = None) -> ReplyData:
+    """
+    Разбирает текст сообщений ответа. Если в любом из них лимит или бан — только limit.
+    На сообщении «ничего не найдено» разбор останавливается, как и раньше.
+    """
+    scanned = [scan_text(message.message or "") for message in messages]
+    for data in scanned:
+        if data.limit:
+            return ReplyData([], [], None, data.limit, False)
+
+    phones, emails = [], []
+    birthday = None
+    not_found = False
+    for data in scanned:
+        if data.not_found:
+            not_found = True
+            break
+        phones.extend(data.phones)
+        emails.extend(data.emails)
+        if data.birthday:
+            birthday = data.birthday
+    return ReplyData(normalize_phones(phones, excluded), list(dict.fromkeys(emails)), birthday, None, not_found)
+
+
+def limit_status(messages) -> Optional[str]:
+    """Текст ошибки лимита или бана, если он есть в ответе, иначе None."""
+    return next((data.limit for data in map(scan_text, (m.message or "" for m in messages)) if data.limit), None)
+
+
+def is_final_text(text: str) -> bool:
+    """После такого сообщения бот больше ничего не пришлёт: «ничего не найдено», лимит или бан."""
+    data = scan_text(text)
+    return data.not_found or data.limit is not None
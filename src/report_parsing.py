@@ -0,0 +1,60 @@
+import asyncio
+import multiprocessing
+import os
+
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Union
+
+from src.html_report import ReportSource, get_phone_numbers_and_birthdate_from_html
+from src.utils import logger
+
+PARSE_EXECUTOR = "process"  # "process" — разбор в отдельных процессах, "thread" — в потоках, "inline" — в цикле событий
+PARSE_WORKERS = max(1, min(4, (os.cpu_count() or 1) - 1))
+PARSE_INLINE_LIMIT = 64 * 1024  # отчёты меньше разбираются сразу: пересылка в процесс дороже самого разбора
+
+ReportData = Dict[str, Union[List[str], Optional[str]]]
+
+_executor: Optional[Executor] = None
+
+
+def _create_executor(kind: str) -> Executor:
+    if kind == "process":
+        try:
+            # spawn, а не fork: форк процесса с потоками Telethon и sheets-io небезопасен
+            return ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        except (OSError, NotImplementedError, ImportError) as e:
+            logger.warning(f"Пул процессов для разбора отчётов недоступен ({e}), разбираем в потоках")
+    return ThreadPoolExecutor(max_workers=PARSE_WORKERS, thread_name_prefix="report-parse")
+
+
+def get_executor() -> Executor:
+    global _executor
+    if _executor is None:
+        _executor = _create_executor(PARSE_EXECUTOR)
+    return _executor
+
+
+async def parse_report(fio: str, source: ReportSource) -> ReportData:
+    """
+    Разбирает HTML-отчёт вне цикла событий: в пуле процессов (или потоков, если процессы недоступны).
+    source — путь к файлу или содержимое отчёта; результат тот же, что у get_phone_numbers_and_birthdate_from_html.
+    """
+    if PARSE_EXECUTOR == "inline" or isinstance(source, (bytes, bytearray)) and len(source) < PARSE_INLINE_LIMIT:
+        return get_phone_numbers_and_birthdate_from_html(fio, source)
+
+    global _executor
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(get_executor(), get_phone_numbers_and_birthdate_from_html, fio, source)
+    except BrokenProcessPool:
+        logger.warning("Пул процессов разбора отчётов упал, дальше разбираем в потоках")
+        _executor = _create_executor("thread")
+        return await loop.run_in_executor(_executor, get_phone_numbers_and_birthdate_from_html, fio, source)
+
+
+def shutdown(wait: bool = True) -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=wait, cancel_futures=True)
+        _executor = None
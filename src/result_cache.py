@@ -0,0 +1,147 @@
+import json
+import os
+import re
+import time
+
+from typing import Dict, List, Optional, Union
+
+from src.storage import connect
+from src.utils import logger
+
+CACHE_PATH = os.path.join("src", "cache.db")
+CACHE_TTL = 30 * 24 * 60 * 60  # сколько живёт найденный результат, секунды
+CACHE_EMPTY_TTL = 3 * 24 * 60 * 60  # сколько живёт ответ "ничего не найдено", секунды
+CACHE_MAX_ENTRIES = 200_000  # сверх этого вытесняются самые старые записи
+CACHE_EVICT_EVERY = 500  # чистка устаревших записей раз в столько вставок
+
+KIND_INN = "inn"
+KIND_FIO_DR = "fio_dr"
+
+
+def normalize_inn(inn: str) -> str:
+    return re.sub(r"\D", "", inn or "")
+
+
+def fio_dr_key(fio: str, birthday: str) -> str:
+    fio_norm = re.sub(r"\s+", " ", (fio or "").lower().strip())
+    return f"{fio_norm}|{(birthday or '').strip()}"
+
+
+class ResultCache:
+    """
+    Локальный кэш ответов бота: по ИНН (/raw) и по ФИО + дате рождения.
+    Пустые ответы ("ничего не найдено") живут меньше, чем найденные.
+    """
+
+    def __init__(
+        self,
+        path: str = CACHE_PATH,
+        ttl: int = CACHE_TTL,
+        empty_ttl: int = CACHE_EMPTY_TTL,
+        max_entries: int = CACHE_MAX_ENTRIES,
+    ):
+        self.ttl = ttl
+        self.empty_ttl = empty_ttl
+        self.max_entries = max_entries
+        self._puts = 0
+        self.conn = connect(path)
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS results (
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                phones TEXT NOT NULL,
+                emails TEXT NOT NULL,
+                birthday TEXT,
+                empty INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (kind, key)
+            );
+            CREATE INDEX IF NOT EXISTS results_created_at ON results (created_at);
+            """
+        )
+
+    def get_inn(self, inn: str) -> Optional[Dict[str, Optional[Union[List[str], str]]]]:
+        """
+        Результат /raw по ИНН в том же виде, что возвращает get_phone_numbers_raw_inn, или None.
+        """
+        row = self._get(KIND_INN, normalize_inn(inn))
+        if row is None:
+            return None
+        return {
+            "phones": json.loads(row["phones"]),
+            "emails": json.loads(row["emails"]),
+            "birthday": row["birthday"],
+        }
+
+    def put_inn(self, inn: str, data: Dict[str, Optional[Union[List[str], str]]]) -> None:
+        phones, emails, birthday = data.get("phones") or [], data.get("emails") or [], data.get("birthday")
+        # Ответ /raw пустой, только если бот не нашёл ни телефонов, ни email, ни даты рождения
+        empty = not phones and not emails and not birthday
+        self._put(KIND_INN, normalize_inn(inn), phones, emails, birthday, empty=empty)
+
+    def get_fio_dr(self, fio: str, birthday: str) -> Optional[List[str]]:
+        row = self._get(KIND_FIO_DR, fio_dr_key(fio, birthday))
+        if row is None:
+            return None
+        return json.loads(row["phones"])
+
+    def put_fio_dr(self, fio: str, birthday: str, phones: List[str]) -> None:
+        # Дата рождения здесь — часть запроса, а не ответа: пустым считается ответ без телефонов
+        self._put(KIND_FIO_DR, fio_dr_key(fio, birthday), phones, [], birthday, empty=not phones)
+
+    def evict(self) -> None:
+        """Удаляет устаревшие записи и самые старые сверх max_entries."""
+        now = time.time()
+        self.conn.execute(
+            "DELETE FROM results WHERE created_at < ? OR (empty = 1 AND created_at < ?)",
+            (now - self.ttl, now - self.empty_ttl),
+        )
+        (count,) = self.conn.execute("SELECT COUNT(*) FROM results").fetchone()
+        if count > self.max_entries:
+            self.conn.execute(
+                "DELETE FROM results WHERE rowid IN (SELECT rowid FROM results ORDER BY created_at LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def _get(self, kind: str, key: str):
+        if not key:
+            return None
+        row = self.conn.execute(
+            "SELECT phones, emails, birthday, empty, created_at FROM results WHERE kind = ? AND key = ?",
+            (kind, key),
+        ).fetchone()
+        if row is None:
+            return None
+
+        ttl = self.empty_ttl if row["empty"] else self.ttl
+        if time.time() - row["created_at"] > ttl:
+            return None
+
+        logger.debug(f"Ответ взят из кэша: {kind} {key}")
+        return row
+
+    def _put(
+        self, kind: str, key: str, phones: List[str], emails: List[str], birthday: Optional[str], empty: bool
+    ) -> None:
+        if not key:
+            return
+        self.conn.execute(
+            "INSERT OR REPLACE INTO results (kind, key, phones, emails, birthday, empty, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (kind, key, json.dumps(phones, ensure_ascii=False), json.dumps(emails, ensure_ascii=False),
+             birthday, int(empty), time.time()),
+        )
+        self._puts += 1
+        if self._puts % CACHE_EVICT_EVERY == 0:
+            self.evict()
+
+
+_cache: Optional[ResultCache] = None
+
+
+def get_cache() -> ResultCache:
+    global _cache
+    if _cache is None:
+        _cache = ResultCache()
+    return _cache
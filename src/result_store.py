@@ -0,0 +1,165 @@
+import datetime as dt
+import os
+import re
+import time
+
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from src.result_cache import normalize_inn
+from src.storage import connect
+
+RESULTS_PATH = os.path.join("src", "results.db")
+LOOKUP_PAGE_MAX = 500  # больше записей за один запрос /api/lookup не отдаётся
+EXPORT_PAGE = 1000  # выгрузка читает базу страницами такого размера
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    inn TEXT NOT NULL,
+    fio TEXT NOT NULL,
+    phones TEXT NOT NULL,
+    emails TEXT NOT NULL,
+    birthday TEXT,
+    session TEXT,
+    source TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_inn ON results (inn, id);
+CREATE TABLE IF NOT EXISTS result_phones (
+    phone TEXT NOT NULL,
+    result_id INTEGER NOT NULL,
+    PRIMARY KEY (phone, result_id)
+) WITHOUT ROWID;
+"""
+
+
+def normalize_phone(phone: str) -> str:
+    """Только цифры; российский номер с 8 в начале приводится к 7."""
+    digits = re.sub(r"\D", "", phone or "")
+    if len(digits) == 11 and digits.startswith("8"):
+        digits = "7" + digits[1:]
+    return digits
+
+
+# Строки «a, b» в том виде, как они пишутся в таблицу; заглушки вроде «телефон не найден» отбрасываются
+def _phones(value: str) -> List[str]:
+    return [phone for phone in (normalize_phone(item) for item in (value or "").split(",")) if phone]
+
+
+def _emails(value: str) -> List[str]:
+    return [item.strip() for item in (value or "").split(",") if "@" in item]
+
+
+class ResultStore:
+    """
+    Все результаты поиска (ИНН, ФИО, телефоны, email, дата рождения, сессия, время) в локальной SQLite-базе
+    с индексами по ИНН и по каждому телефону. Бот дописывает, админка ищет, не обращаясь к Google Sheets.
+    """
+
+    def __init__(self, path: str = RESULTS_PATH):
+        self.conn = connect(path)
+        self.conn.executescript(_SCHEMA)
+
+    def add(
+        self,
+        inn: str,
+        fio: str,
+        phones: str,
+        emails: str,
+        birthday: Optional[str] = None,
+        session: Optional[str] = None,
+        source: Optional[str] = None,
+    ) -> None:
+        """phones и emails — строки в том виде, в каком они пишутся в таблицу."""
+        phone_list = _phones(phones)
+        email_list = _emails(emails)
+        self.conn.execute("BEGIN")
+        try:
+            cursor = self.conn.execute(
+                "INSERT INTO results (inn, fio, phones, emails, birthday, session, source, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (normalize_inn(inn), fio or "", ", ".join(phone_list), ", ".join(email_list),
+                 birthday, session, source, time.time()),
+            )
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO result_phones (phone, result_id) VALUES (?, ?)",
+                [(phone, cursor.lastrowid) for phone in set(phone_list)],
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def find(
+        self,
+        inn: Optional[str] = None,
+        phone: Optional[str] = None,
+        limit: int = 50,
+        before: Optional[int] = None,
+    ) -> Tuple[int, List[Dict[str, Any]]]:
+        """
+        Результаты по ИНН и/или телефону, новые первыми: (всего совпадений, страница).
+        Следующая страница — before=id последней записи страницы.
+        """
+        where, params = self._where(inn, phone)
+        (total,) = self.conn.execute(f"SELECT COUNT(*) FROM results WHERE {where}", params).fetchone()
+        page = self._page(where, params, min(max(limit, 1), LOOKUP_PAGE_MAX), before)
+        return total, page
+
+    def iter_all(self, inn: Optional[str] = None, phone: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Все совпадения (без фильтров — вся база), страницами по EXPORT_PAGE, новые первыми."""
+        where, params = self._where(inn, phone)
+        before = None
+        while True:
+            page = self._page(where, params, EXPORT_PAGE, before)
+            yield from page
+            if len(page) < EXPORT_PAGE:
+                return
+            before = page[-1]["id"]
+
+    def close(self) -> None:
+        self.conn.close()
+
+    @staticmethod
+    def _where(inn: Optional[str], phone: Optional[str]) -> Tuple[str, list]:
+        # Пустое поле формы (inn=) — не фильтр
+        clauses, params = ["1"], []
+        if inn:
+            clauses.append("inn = ?")
+            params.append(normalize_inn(inn))
+        if phone:
+            clauses.append("id IN (SELECT result_id FROM result_phones WHERE phone = ?)")
+            params.append(normalize_phone(phone))
+        return " AND ".join(clauses), params
+
+    def _page(self, where: str, params: list, limit: int, before: Optional[int]) -> List[Dict[str, Any]]:
+        if before is not None:
+            where += " AND id < ?"
+            params = params + [before]
+        rows = self.conn.execute(
+            f"SELECT * FROM results WHERE {where} ORDER BY id DESC LIMIT ?", params + [limit]
+        ).fetchall()
+        return [
+            {
+                "id": row["id"],
+                "inn": row["inn"],
+                "fio": row["fio"],
+                "phones": _phones(row["phones"]),
+                "emails": _emails(row["emails"]),
+                "birthday": row["birthday"],
+                "session": row["session"],
+                "source": row["source"],
+                "created_at": dt.datetime.fromtimestamp(row["created_at"]).isoformat(timespec="seconds"),
+            }
+            for row in rows
+        ]
+
+
+_store: Optional[ResultStore] = None
+
+
+def get_result_store() -> ResultStore:
+    global _store
+    if _store is None:
+        _store = ResultStore()
+    return _store
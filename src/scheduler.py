@@ -0,0 +1,152 @@
+import datetime as dt
+import time
+
+from typing import Dict, List, Optional, Tuple
+
+from src.instrumentation import QUOTA_REMAINING
+from src.utils import dump_json, load_json, logger
+
+QUOTA_RESET_TIME = dt.time(0, 0)  # локальное время, когда бот обнуляет суточный лимит
+DEFAULT_DAILY_LIMIT = 68  # лимит сессии, если в sessions.json он не указан
+IDLE_RECHECK = 60 * 60  # если необработанных строк нет, перепроверяем лист раз в столько секунд
+SAVE_INTERVAL = 60  # счётчики запросов сохраняются в sessions.json не чаще, чем раз в столько секунд (и в конце цикла)
+
+# Поля записи сессии в sessions.json: [api_id, api_hash, сделано_запросов, лимит_на_день, день_квоты]
+_DONE, _LIMIT, _DAY = 2, 3, 4
+
+
+class QuotaScheduler:
+    """
+    Учёт суточных запросов сессий по полям из sessions.json.
+    Счётчики обнуляются в QUOTA_RESET_TIME; работу получают только сессии с остатком квоты.
+    """
+
+    def __init__(self, reset_time: dt.time = QUOTA_RESET_TIME, default_limit: int = DEFAULT_DAILY_LIMIT):
+        self.reset_time = reset_time
+        self.default_limit = default_limit
+        self.sessions: Dict[str, list] = {}
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        self.reload()
+
+    def reload(self) -> None:
+        """Перечитывает sessions.json (там могли появиться новые сессии) и обнуляет истёкшие счётчики."""
+        # Несохранённые счётчики сначала пишем в файл, иначе перечитывание их потеряет
+        self.flush()
+        self.sessions = {name: self._normalize(items) for name, items in load_json().items()}
+        self._reset_expired()
+        # Остаток квоты виден в /metrics сразу после запуска, а не с первого запроса
+        self._publish()
+
+    def quota_day(self, now: Optional[dt.datetime] = None) -> dt.date:
+        """День квоты: до времени сброса ещё идёт вчерашний."""
+        now = now or dt.datetime.now()
+        if now.time() >= self.reset_time:
+            return now.date()
+        return now.date() - dt.timedelta(days=1)
+
+    def next_reset(self, now: Optional[dt.datetime] = None) -> dt.datetime:
+        now = now or dt.datetime.now()
+        return dt.datetime.combine(self.quota_day(now) + dt.timedelta(days=1), self.reset_time)
+
+    def seconds_until_reset(self) -> float:
+        return max((self.next_reset() - dt.datetime.now()).total_seconds(), 0.0)
+
+    def used(self, session_name: str) -> int:
+        return self.sessions[session_name][_DONE]
+
+    def limit(self, session_name: str) -> int:
+        return self.sessions[session_name][_LIMIT]
+
+    def remaining(self, session_name: str) -> int:
+        if session_name not in self.sessions:
+            return 0
+        self._reset_expired()
+        return max(self.limit(session_name) - self.used(session_name), 0)
+
+    def has_quota(self, session_name: str) -> bool:
+        return self.remaining(session_name) > 0
+
+    def available_sessions(self) -> List[Tuple[str, list]]:
+        """Сессии, у которых остались запросы на сегодня, с их данными из sessions.json."""
+        self._reset_expired()
+        return [(name, items) for name, items in self.sessions.items() if self.remaining(name) > 0]
+
+    def record_request(self, session_name: str) -> None:
+        if session_name not in self.sessions:
+            return
+        self._reset_expired()
+        self.sessions[session_name][_DONE] += 1
+        self._dirty = True
+        if time.monotonic() - self._saved_at >= SAVE_INTERVAL:
+            self._save()
+        else:
+            self._publish()
+
+    def mark_exhausted(self, session_name: str) -> None:
+        """Бот сообщил о лимите раньше, чем мы насчитали: считаем квоту сессии исчерпанной до сброса."""
+        if session_name not in self.sessions:
+            return
+        items = self.sessions[session_name]
+        items[_DONE] = max(items[_DONE], items[_LIMIT])
+        self._save()
+
+    def flush(self) -> None:
+        """Сохраняет счётчики в sessions.json, если они менялись после последнего сохранения."""
+        if self._dirty:
+            self._save()
+
+    def summary(self) -> Dict[str, Dict[str, int]]:
+        self._reset_expired()
+        return {
+            name: {"used": self.used(name), "limit": self.limit(name), "remaining": self.remaining(name)}
+            for name in self.sessions
+        }
+
+    def _normalize(self, items: list) -> list:
+        items = list(items)
+        if len(items) <= _DONE:
+            items.append(0)
+        if len(items) <= _LIMIT:
+            items.append(self.default_limit)
+        if len(items) <= _DAY:
+            items.append(self.quota_day().isoformat())
+        return items
+
+    def _reset_expired(self) -> None:
+        today = self.quota_day().isoformat()
+        changed = False
+        for name, items in self.sessions.items():
+            if items[_DAY] != today:
+                logger.info(f"Новый день квоты для {name}: обнулён счётчик ({items[_DONE]}/{items[_LIMIT]})")
+                items[_DONE] = 0
+                items[_DAY] = today
+                changed = True
+        if changed:
+            self._save()
+
+    def _publish(self) -> None:
+        for name, items in self.sessions.items():
+            QUOTA_REMAINING.set(max(items[_LIMIT] - items[_DONE], 0), session=name)
+
+    def _save(self) -> None:
+        self._publish()
+
+        # Перечитываем файл, чтобы не затереть сессии, добавленные через create_session.py
+        template = load_json()
+        for name, items in self.sessions.items():
+            if name in template:
+                template[name] = items
+        dump_json(template)
+        self._dirty = False
+        self._saved_at = time.monotonic()
+
+
+_scheduler: Optional[QuotaScheduler] = None
+
+
+def get_scheduler() -> QuotaScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = QuotaScheduler()
+    return _scheduler
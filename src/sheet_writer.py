@@ -0,0 +1,177 @@
+import asyncio
+import time
+
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from gspread.utils import rowcol_to_a1
+
+from src.instrumentation import WRITER_BUFFER
+from src.utils import logger
+
+BATCH_MAX_ROWS = 20  # сбрасываем буфер, как только набралось столько строк
+BATCH_FLUSH_INTERVAL = 60  # и не реже, чем раз в столько секунд
+BATCH_MAX_BUFFERED = 5 * BATCH_MAX_ROWS  # если таблица не успевает и буфер дорос до этого, add ждёт записи
+
+
+class SheetFlushError(Exception):
+    """
+    Не удалось записать буфер в таблицу. Строки остаются в буфере и будут записаны при следующем сбросе.
+    """
+
+    def __init__(self, rows: List[int], cause: Exception):
+        self.rows = rows
+        self.cause = cause
+        super().__init__(f"Не удалось записать строки {rows} в таблицу: {cause}")
+
+
+class SheetBatchWriter:
+    """
+    Буфер результатов по строкам листа. Вместо update_cell на каждую ячейку копит значения
+    и записывает их одним batch_update: по размеру буфера, по таймеру и при закрытии.
+    Запись идёт в фоне, пока сессии ждут ответов бота; add ждёт её, только когда буфер дорос до max_buffered.
+    wks — AsyncWorksheet. После успешной записи номера строк передаются в on_flushed.
+    """
+
+    def __init__(
+        self,
+        wks,
+        columns: Sequence[int],
+        max_rows: int = BATCH_MAX_ROWS,
+        flush_interval: float = BATCH_FLUSH_INTERVAL,
+        on_flushed: Optional[Callable[[List[int]], None]] = None,
+        max_buffered: int = BATCH_MAX_BUFFERED,
+    ):
+        self.wks = wks
+        self.columns = tuple(columns)
+        self.max_rows = max_rows
+        self.flush_interval = flush_interval
+        self.on_flushed = on_flushed
+        self.max_buffered = max(max_buffered, max_rows)
+        self._pending: Dict[int, Tuple[str, ...]] = {}
+        self._lock = asyncio.Lock()
+        self._last_flush = time.monotonic()
+        self._timer: Optional[asyncio.Task] = None
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def start(self) -> None:
+        """Запускает фоновый сброс буфера по таймеру."""
+        if self._timer is None:
+            self._timer = asyncio.create_task(self._flush_periodically())
+
+    async def add(self, row: int, *values: str) -> None:
+        """
+        Кладёт значения строки в буфер (по одному на каждый столбец из columns) и, если пора, запускает запись в фоне.
+        Если буфер переполнен и запись не удалась, бросает SheetFlushError — строки при этом остаются в буфере.
+        """
+        await self.add_many((row,), *values)
+
+    async def add_many(self, rows: Iterable[int], *values: str) -> None:
+        """Одни и те же значения в несколько строк; все они попадают в одну запись."""
+        if len(values) != len(self.columns):
+            raise ValueError(f"Ожидалось {len(self.columns)} значений, получено {len(values)}")
+
+        for row in rows:
+            self._pending[row] = tuple(values)
+        WRITER_BUFFER.set(len(self._pending))
+        if len(self._pending) >= self.max_buffered:
+            # Таблица не успевает за ботом: ждём записи, а не копим буфер без предела
+            await self.flush()
+        elif len(self._pending) >= self.max_rows or time.monotonic() - self._last_flush >= self.flush_interval:
+            self._flush_in_background()
+
+    async def flush(self) -> None:
+        async with self._lock:
+            if not self._pending:
+                self._last_flush = time.monotonic()
+                return
+
+            batch = self._pending
+            self._pending = {}
+            try:
+                await self.wks.batch_update(self._build_ranges(batch))
+            except Exception as e:
+                # Возвращаем строки в буфер, не затирая более свежие значения
+                for row, values in batch.items():
+                    self._pending.setdefault(row, values)
+                logger.error(f"Ошибка записи {len(batch)} строк в таблицу, оставлены в буфере: {e}")
+                raise SheetFlushError(sorted(batch), e) from e
+
+            self._last_flush = time.monotonic()
+            WRITER_BUFFER.set(len(self._pending))
+            logger.debug(f"Записано в таблицу строк: {len(batch)}")
+            if self.on_flushed is not None:
+                self.on_flushed(sorted(batch))
+
+    async def close(self) -> None:
+        """
+        Останавливает таймер и записывает остаток буфера.
+        Если запись не удалась, незаписанные значения выводятся в лог и бросается SheetFlushError.
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            try:
+                await self._timer
+            except asyncio.CancelledError:
+                pass
+            self._timer = None
+        if self._flush_task is not None:
+            await self._flush_task
+            self._flush_task = None
+
+        try:
+            await self.flush()
+        except SheetFlushError:
+            for row, values in sorted(self._pending.items()):
+                logger.error(f"Не записана строка {row}: {' | '.join(values)}")
+            raise
+
+    def _build_ranges(self, batch: Dict[int, Tuple[str, ...]]) -> List[dict]:
+        """
+        Соседние строки объединяются в один диапазон, если столбцы идут подряд.
+        """
+        first_col, last_col = self.columns[0], self.columns[-1]
+        contiguous = list(self.columns) == list(range(first_col, last_col + 1))
+
+        ranges = []
+        if not contiguous:
+            for row, values in sorted(batch.items()):
+                for col, value in zip(self.columns, values):
+                    ranges.append({"range": rowcol_to_a1(row, col), "values": [[value]]})
+            return ranges
+
+        block_start, block_values = None, []
+        for row in sorted(batch):
+            if block_start is not None and row != block_start + len(block_values):
+                ranges.append(self._block_range(block_start, block_values))
+                block_start, block_values = None, []
+            if block_start is None:
+                block_start = row
+            block_values.append(list(batch[row]))
+        if block_start is not None:
+            ranges.append(self._block_range(block_start, block_values))
+
+        return ranges
+
+    def _block_range(self, start_row: int, values: List[List[str]]) -> dict:
+        end_row = start_row + len(values) - 1
+        cell_range = f"{rowcol_to_a1(start_row, self.columns[0])}:{rowcol_to_a1(end_row, self.columns[-1])}"
+        return {"range": cell_range, "values": values}
+
+    def _flush_in_background(self) -> None:
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_quietly())
+
+    async def _flush_quietly(self) -> None:
+        try:
+            await self.flush()
+        except SheetFlushError:
+            # уже залогировано, строки остались в буфере до следующей попытки
+            pass
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self._flush_quietly()
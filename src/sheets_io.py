@@ -0,0 +1,234 @@
+import asyncio
+import collections
+import functools
+import random
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Deque, Dict, List, Optional, Tuple
+
+from gspread.exceptions import APIError
+from requests.exceptions import ConnectionError as RequestsConnectionError, Timeout
+
+from src.instrumentation import SHEETS_RETRIES
+from src.utils import logger
+
+SHEETS_IO_WORKERS = 1  # запросы к таблице идут по одному, как и раньше, но вне цикла событий
+# Квоты Sheets API на пользователя: 60 чтений и 60 записей в минуту
+SHEETS_READS_PER_MINUTE = 60
+SHEETS_WRITES_PER_MINUTE = 60
+SHEETS_MAX_RETRIES = 5
+SHEETS_BACKOFF_BASE = 2  # первая пауза после 429/5xx, секунды; дальше удваивается
+SHEETS_BACKOFF_MAX = 64
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+READ, WRITE = "read", "write"
+WRITE_METHODS = frozenset({
+    "update", "update_cell", "update_cells", "update_acell", "batch_update", "append_row", "append_rows",
+    "insert_row", "insert_rows", "delete_rows", "delete_columns", "clear", "batch_clear", "format", "batch_format",
+})
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=SHEETS_IO_WORKERS, thread_name_prefix="sheets-io")
+    return _executor
+
+
+async def run_sheets_call(func, *args, **kwargs):
+    """Выполняет синхронный вызов gspread в отдельном потоке, не блокируя Telethon и другие сессии."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), functools.partial(func, *args, **kwargs))
+
+
+async def _resolve(future: asyncio.Future, coro):
+    """Передаёт результат coro в future, на который ждут объединённые вызовы."""
+    try:
+        result = await coro
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        future.exception()  # ошибку получат ожидающие, а не «exception was never retrieved»
+        raise
+    future.set_result(result)
+    return result
+
+
+def _retry_status(error: Exception) -> Optional[str]:
+    """Код ответа, после которого запрос стоит повторить, иначе None."""
+    if isinstance(error, APIError):
+        code = error.code if error.code != -1 else error.response.status_code
+        return str(code) if code in RETRY_STATUSES else None
+    if isinstance(error, (RequestsConnectionError, Timeout)):
+        return "connection"
+    return None
+
+
+class _MinuteBudget:
+    """Не больше limit запросов за любые 60 секунд."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._sent: Deque[float] = collections.deque()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                while self._sent and now - self._sent[0] >= 60:
+                    self._sent.popleft()
+                wait = self._blocked_until - now
+                if wait <= 0 and len(self._sent) >= self.limit:
+                    wait = 60 - (now - self._sent[0])
+                if wait <= 0:
+                    self._sent.append(now)
+                    return
+                logger.debug(f"Квота Sheets API: пауза {wait:.1f} сек.")
+                await asyncio.sleep(wait)
+
+    def block(self, seconds: float) -> None:
+        """После 429 запросы этого вида не отправляются, пока идёт пауза."""
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+
+class _WriteGroup:
+    def __init__(self):
+        self.data: List[dict] = []
+        self.callers = 0
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+
+class SheetsGovernor:
+    """
+    Единая точка для всех запросов к Google Sheets:
+    держит поминутные квоты на чтение и запись, повторяет 429/5xx с экспоненциальной паузой и разбросом,
+    объединяет одинаковые одновременные чтения, а batch_update одного листа, ждущие квоту
+    или окончания предыдущей записи, — в один запрос.
+    """
+
+    def __init__(self, reads_per_minute: int = SHEETS_READS_PER_MINUTE, writes_per_minute: int = SHEETS_WRITES_PER_MINUTE):
+        self.budgets = {READ: _MinuteBudget(reads_per_minute), WRITE: _MinuteBudget(writes_per_minute)}
+        self._reads: Dict[Tuple, asyncio.Future] = {}
+        self._writes: Dict[Tuple, _WriteGroup] = {}
+        self._write_locks: Dict[Tuple, asyncio.Lock] = {}
+
+    async def call(self, kind: str, func, *args, **kwargs):
+        """Выполняет вызов gspread в рамках квоты kind, повторяя его после 429/5xx."""
+        return await self._call(kind, func, args, kwargs)
+
+    async def _call(self, kind: str, func, args: tuple, kwargs: dict, acquired: bool = False):
+        budget = self.budgets[kind]
+        for attempt in range(SHEETS_MAX_RETRIES + 1):
+            if not acquired or attempt:
+                await budget.acquire()
+            try:
+                return await run_sheets_call(func, *args, **kwargs)
+            except Exception as e:
+                status = _retry_status(e)
+                if status is None or attempt == SHEETS_MAX_RETRIES:
+                    raise
+                delay = min(SHEETS_BACKOFF_MAX, SHEETS_BACKOFF_BASE * 2 ** attempt)
+                delay = random.uniform(delay / 2, delay)
+                if status == "429":
+                    budget.block(delay)
+                SHEETS_RETRIES.inc(kind=kind, status=status)
+                logger.warning(
+                    f"Sheets API: {status} на {getattr(func, '__name__', func)}, "
+                    f"повтор через {delay:.1f} сек. ({attempt + 1}/{SHEETS_MAX_RETRIES})"
+                )
+                await asyncio.sleep(delay)
+
+    async def read(self, key: Tuple, func, *args, **kwargs):
+        """Чтение; одинаковые чтения, идущие одновременно, выполняются одним запросом."""
+        try:
+            future = self._reads.get(key)
+        except TypeError:  # аргументы нехэшируемые — объединять нечего
+            return await self.call(READ, func, *args, **kwargs)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._reads[key] = future
+        try:
+            return await _resolve(future, self.call(READ, func, *args, **kwargs))
+        finally:
+            self._reads.pop(key, None)
+
+    async def batch_update(self, key: Tuple, func, data: List[dict], **kwargs):
+        """
+        batch_update листа. Записи одного листа идут по очереди; пока запрос ждёт свою очередь или квоту,
+        следующие для того же листа дописывают к нему свои диапазоны и получают его результат.
+        """
+        group = self._writes.get(key)
+        if group is not None:
+            group.data.extend(data)
+            group.callers += 1
+            return await asyncio.shield(group.future)
+
+        group = _WriteGroup()
+        group.data.extend(data)
+        self._writes[key] = group
+        try:
+            async with self._write_locks.setdefault(key, asyncio.Lock()):
+                try:
+                    await self.budgets[WRITE].acquire()
+                finally:
+                    # Дальше диапазоны к этой группе не добавляются
+                    self._writes.pop(key, None)
+                if group.callers:
+                    logger.debug(f"Объединено запросов batch_update: {group.callers + 1}, диапазонов: {len(group.data)}")
+
+                # Квота уже взята: первая попытка идёт сразу, повторы — снова через квоту
+                return await _resolve(group.future, self._call(WRITE, func, (group.data,), kwargs, acquired=True))
+        except asyncio.CancelledError:
+            if not group.future.done():
+                group.future.cancel()
+            raise
+
+
+_governor: Optional[SheetsGovernor] = None
+
+
+def get_governor() -> SheetsGovernor:
+    global _governor
+    if _governor is None:
+        _governor = SheetsGovernor()
+    return _governor
+
+
+class AsyncWorksheet:
+    """
+    Асинхронная обёртка над gspread.Worksheet: каждый метод возвращает корутину,
+    а сам HTTP-запрос выполняется в потоке get_executor() через общий SheetsGovernor.
+    Атрибуты без вызова (row_count и т.п.) отдаются как есть.
+    """
+
+    def __init__(self, wks):
+        self.sync = wks
+
+    def __getattr__(self, name):
+        attr = getattr(self.sync, name)
+        if not callable(attr):
+            return attr
+
+        governor = get_governor()
+        if name == "batch_update":
+            async def call(data, **kwargs):
+                key = (id(self.sync), tuple(sorted(kwargs.items())))
+                return await governor.batch_update(key, attr, data, **kwargs)
+        elif name in WRITE_METHODS:
+            async def call(*args, **kwargs):
+                return await governor.call(WRITE, attr, *args, **kwargs)
+        else:
+            async def call(*args, **kwargs):
+                key = (id(self.sync), name, args, tuple(sorted(kwargs.items())))
+                return await governor.read(key, attr, *args, **kwargs)
+
+        return call
@@ -0,0 +1,46 @@
+import json
+import os
+import sqlite3
+
+from typing import Any, Optional
+
+from src.utils import logger
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """
+    Открывает локальную SQLite-базу (WAL, чтобы админка могла читать, пока бот пишет).
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def load_json_state(path: str, default: Any = None, warning: Optional[str] = None) -> Any:
+    """
+    Состояние из JSON-файла. Если файла нет или его не удалось прочитать — default;
+    во втором случае в лог пишется warning (если он задан).
+    """
+    if not os.path.exists(path):
+        return default
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        if warning:
+            logger.warning(warning)
+        return default
+
+
+def save_json_atomic(path: str, data: Any, indent: Optional[int] = 4) -> None:
+    """Записывает data во временный файл рядом с path и подменяет им path: читатель не увидит файл наполовину."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=indent, ensure_ascii=False)
+    os.replace(tmp_path, path)
@@ -0,0 +1,119 @@
+import asyncio
+import collections
+import contextvars
+import os
+import time
+
+from contextlib import contextmanager
+from typing import Deque, Iterable, Iterator, List, Optional
+
+from src.instrumentation import SNAPSHOT_INTERVAL
+from src.storage import load_json_state, save_json_atomic
+
+TRACES_PATH = os.path.join("src", "traces.json")
+TRACE_CAPACITY = 200  # сколько последних трасс строк хранится и отдаётся админке
+
+OK, STOPPED, FAILED = "ok", "stopped", "error"
+
+
+class Trace:
+    """Этапы обработки одной строки (вместе с дублями по ИНН): начало и конец каждого, относительно начала строки."""
+
+    def __init__(self, rows: Iterable[int], inn: str, session: Optional[str]):
+        self.rows = list(rows)
+        self.inn = inn
+        self.session = session
+        self.started_at = time.time()
+        self.result = OK
+        self.duration = 0.0
+        self.spans: List[dict] = []
+        self._start = time.perf_counter()
+        self._depth = 0
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._start
+
+    def to_dict(self) -> dict:
+        return {
+            "rows": self.rows,
+            "inn": self.inn,
+            "session": self.session,
+            "started_at": self.started_at,
+            "duration": round(self.duration, 4),
+            "result": self.result,
+            "spans": sorted(self.spans, key=lambda s: (s["start"], s["depth"])),
+        }
+
+
+_current: "contextvars.ContextVar[Optional[Trace]]" = contextvars.ContextVar("trace", default=None)
+_traces: Deque[dict] = collections.deque(maxlen=TRACE_CAPACITY)
+_version = 0
+
+
+@contextmanager
+def trace_row(rows: Iterable[int], inn: str, session: Optional[str] = None) -> Iterator[Trace]:
+    """
+    Трасса строки: этапы, отмеченные span() внутри этого блока (в той же задаче asyncio), попадают в неё.
+    По выходу трасса кладётся в кольцевой буфер последних TRACE_CAPACITY строк.
+    """
+    global _version
+    trace = Trace(rows, inn, session)
+    token = _current.set(trace)
+    try:
+        yield trace
+    except BaseException:
+        trace.result = FAILED
+        raise
+    finally:
+        _current.reset(token)
+        trace.duration = trace.elapsed()
+        _traces.append(trace.to_dict())
+        _version += 1
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Отмечает этап текущей строки; вне trace_row ничего не делает."""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+
+    start = trace.elapsed()
+    trace._depth += 1
+    try:
+        yield
+    finally:
+        trace._depth -= 1
+        trace.spans.append({
+            "stage": stage,
+            "start": round(start, 4),
+            "end": round(trace.elapsed(), 4),
+            "depth": trace._depth,
+        })
+
+
+def recent_traces(n: int = TRACE_CAPACITY) -> List[dict]:
+    """Последние n трасс, новые первыми."""
+    return list(reversed(_traces))[:n]
+
+
+def dump_traces(path: str = TRACES_PATH) -> None:
+    """Атомарно сохраняет буфер трасс, чтобы админка отдала его в /api/traces."""
+    save_json_atomic(path, {"updated_at": time.time(), "traces": recent_traces()}, indent=None)
+
+
+async def run_trace_writer(interval: float = SNAPSHOT_INTERVAL) -> None:
+    dumped = None
+    while True:
+        if dumped != _version:
+            try:
+                dump_traces()
+                dumped = _version
+            except OSError:
+                pass
+        await asyncio.sleep(interval)
+
+
+def load_traces(path: str = TRACES_PATH) -> Optional[dict]:
+    return load_json_state(path)
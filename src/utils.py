@@ -1,10 +1,13 @@
 import json
+import os
 from sys import stderr
 from loguru import logger
 
 logger.remove()
+# Имя сессии подставляется через logger.contextualize(session=...), иначе "-"
+logger.configure(extra={"session": "-"})
 logger.add("src/logs.log",
-           format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {line} - {message}",
+           format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {extra[session]} | {line} - {message}",
            rotation="5 MB",
            compression="zip",
            level="DEBUG")
@@ -14,8 +17,10 @@ def load_json() -> dict:
     """
     Данные с 'src/sessions.json'
 
-    {'session<номер сессий>': [апи_айди, 'апи_хэш', текущее_количество_совершенных_запросов_за_сегодня, максимально_допустимое_количество_запросов_за_этот_день], ...}
-    {'session1': [48512348, 'cdsvjdvd4cas6c47848cdsc6c56', 0, 68], ...}
+    {'session<номер сессий>': [апи_айди, 'апи_хэш', текущее_количество_совершенных_запросов_за_сегодня, максимально_допустимое_количество_запросов_за_этот_день, день_квоты], ...}
+    {'session1': [48512348, 'cdsvjdvd4cas6c47848cdsc6c56', 0, 68, '2025-08-16'], ...}
+
+    Последние три поля необязательны, их ведёт src/scheduler.py.
     """
     with open("src/sessions.json", "r", encoding='utf-8') as f:
         template = json.load(f)
@@ -25,7 +30,14 @@ def load_json() -> dict:
 
 def dump_json(template: dict):
     """
-    Перезапись данных в 'src/sessions.json'
+    Перезапись данных в 'src/sessions.json'.
+    Пишется временный файл (доступ только владельцу) и подменяет старый: при падении посреди записи ключи сессий не теряются.
     """
-    with open("src/sessions.json", "w", encoding="utf-8") as f:
+    tmp_path = "src/sessions.json.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
         json.dump(template, f, indent=4, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.chmod(tmp_path, 0o600)
+    os.replace(tmp_path, "src/sessions.json")
@@ -0,0 +1,18 @@
+import pytest
+
+from src import journal, lookup_strategy, metrics, result_cache, result_store, scheduler
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    """Базы и файлы состояния лежат по относительным путям src/...: каждый тест работает в своей папке."""
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "sessions.json").write_text("{}", encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(result_cache, "_cache", None)
+    monkeypatch.setattr(result_store, "_store", None)
+    monkeypatch.setattr(metrics, "_writer", None)
+    monkeypatch.setattr(scheduler, "_scheduler", None)
+    monkeypatch.setattr(lookup_strategy, "_planner", None)
+    monkeypatch.setattr(journal, "_journals", {})
+    return tmp_path
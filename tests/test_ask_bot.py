@@ -0,0 +1,81 @@
+import asyncio
+
+from types import SimpleNamespace
+
+import pytest
+
+from src import google_sheets
+from src.bot_replies import NoReplyError
+from src.reply_extract import BAN_TEXTS, LIMIT_PATTERNS
+from src.scheduler import get_scheduler
+
+
+class FakeLimiter:
+    def __init__(self):
+        self.calls = []
+
+    async def acquire(self):
+        pass
+
+    def on_success(self):
+        self.calls.append("success")
+
+    def on_limit(self):
+        self.calls.append("limit")
+
+
+class FakeCollector:
+    def __init__(self, reply):
+        self.reply = reply
+
+    async def request(self, text):
+        if isinstance(self.reply, Exception):
+            raise self.reply
+        return [SimpleNamespace(id=2, message=self.reply, media=None)]
+
+
+@pytest.fixture
+def ask(monkeypatch, workdir):
+    (workdir / "src" / "sessions.json").write_text('{"s1": [1, "hash", 0, 10]}', encoding="utf-8")
+    limiter = FakeLimiter()
+
+    async def ensure_connected(client):
+        pass
+
+    monkeypatch.setattr(google_sheets, "ensure_connected", ensure_connected)
+    monkeypatch.setattr(google_sheets, "get_limiter", lambda session_name: limiter)
+
+    def run(reply):
+        monkeypatch.setattr(google_sheets, "get_collector", lambda client, chat, is_final: FakeCollector(reply))
+        client = SimpleNamespace(session=SimpleNamespace(filename="sessions/s1.session"))
+        asyncio.run(google_sheets._ask_bot(client, "bot", "/raw 1", "raw"))
+        return limiter.calls
+
+    run.limiter = limiter
+    return run
+
+
+def test_ban_texts_are_limit_texts():
+    assert set(BAN_TEXTS) <= {text for _, text in LIMIT_PATTERNS}
+
+
+def test_daily_limit_keeps_rate(ask):
+    assert ask("Вы исчерпали лимит запросов на сегодня") == []
+    assert not get_scheduler().has_quota("s1")
+
+
+def test_ban_lowers_rate(ask):
+    assert ask("Ваш аккаунт был заблокирован") == ["limit"]
+    assert not get_scheduler().has_quota("s1")
+
+
+def test_reply_raises_rate(ask):
+    assert ask("ничего не найдено") == ["success"]
+    assert get_scheduler().remaining("s1") == 9
+
+
+def test_no_reply_keeps_rate(ask):
+    with pytest.raises(NoReplyError):
+        ask(NoReplyError("нет ответа"))
+    assert ask.limiter.calls == []
+    assert get_scheduler().remaining("s1") == 9
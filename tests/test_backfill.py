@@ -0,0 +1,102 @@
+import asyncio
+import json
+
+import gspread
+
+import backfill
+from backfill import Backfill, ResultSink, upload
+
+
+class FakeGovernor:
+    def __init__(self):
+        self.calls = []
+
+    async def call(self, kind, func, *args, **kwargs):
+        self.calls.append((kind, func.__name__))
+        return func(*args, **kwargs)
+
+
+class FakeWorksheet:
+    def __init__(self, rows):
+        self.row_count = rows
+        self.updates = []
+
+    def resize(self, rows):
+        self.row_count = rows
+
+    def update(self, values, range_name):
+        self.updates.append((range_name, values))
+
+
+class FakeTable:
+    def __init__(self, worksheets):
+        self.worksheets = worksheets
+
+    def worksheet(self, title):
+        if title not in self.worksheets:
+            raise gspread.WorksheetNotFound(title)
+        return self.worksheets[title]
+
+    def add_worksheet(self, title, rows, cols):
+        self.worksheets[title] = FakeWorksheet(rows)
+        return self.worksheets[title]
+
+
+def _sink(workdir):
+    path = workdir / "results.jsonl"
+    records = [{"offset": i, "inn": str(i), "fio": "", "phones": "", "emails": "", "birthday": ""} for i in range(3)]
+    path.write_text("".join(json.dumps(r) + "\n" for r in records), encoding="utf-8")
+    return ResultSink(str(path), "jsonl")
+
+
+def _run(monkeypatch, workdir, table):
+    governor = FakeGovernor()
+    monkeypatch.setattr(backfill, "get_governor", lambda: governor)
+    monkeypatch.setattr(backfill, "get_table", lambda: table)
+    # Запись значений идёт через AsyncWorksheet, у которого свой доступ к квоте
+    monkeypatch.setattr("src.sheets_io.get_governor", lambda: governor)
+    asyncio.run(upload(_sink(workdir), "Выгрузка"))
+    return governor.calls
+
+
+def test_upload_creates_worksheet_through_governor(monkeypatch, workdir):
+    table = FakeTable({})
+    calls = _run(monkeypatch, workdir, table)
+
+    assert calls[:3] == [("read", "<lambda>"), ("read", "worksheet"), ("write", "add_worksheet")]
+    assert len(table.worksheets["Выгрузка"].updates[0][1]) == 4
+
+
+def test_upload_resizes_worksheet_through_governor(monkeypatch, workdir):
+    table = FakeTable({"Выгрузка": FakeWorksheet(2)})
+    calls = _run(monkeypatch, workdir, table)
+
+    assert ("write", "resize") in calls
+    assert table.worksheets["Выгрузка"].row_count == 4
+
+
+def _read(rows, done, max_rows):
+    async def run():
+        job = Backfill(iter(rows), None, max_rows)
+        job.done = set(done)
+        await job._read(workers=1)
+        return job
+
+    return asyncio.run(run())
+
+
+def test_max_rows_reaching_last_row_finishes_input():
+    rows = [(offset, "", str(offset)) for offset in range(5)]
+    job = _read(rows, done={0, 1, 2}, max_rows=2)
+    assert job.queued == {3, 4}
+    assert job.input_finished
+
+
+def test_max_rows_leaves_rest_of_input():
+    rows = [(offset, "", str(offset)) for offset in range(5)]
+    job = _read(rows, done={0, 4}, max_rows=2)
+    assert job.queued == {1, 2}
+    assert not job.input_finished
+    # Строки прошлых запусков, до которых этот запуск не дошёл, в остаток не входят
+    job.done.update(job.queued)
+    assert len(job.queued - job.done) == 0
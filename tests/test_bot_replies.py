@@ -0,0 +1,70 @@
+import asyncio
+
+from types import SimpleNamespace
+
+import pytest
+
+from src import bot_replies
+from src.bot_replies import NoReplyError, ReplyCollector, drop_collector, get_collector
+
+
+class SilentClient:
+    """Клиент, у которого бот ничего не отвечает: в чате только сообщения до запроса и сам запрос."""
+
+    def __init__(self):
+        self.history = [SimpleNamespace(id=1, message="старый ответ")]
+        self.handlers = []
+
+    def add_event_handler(self, handler, event):
+        self.handlers.append(handler)
+
+    def remove_event_handler(self, handler):
+        self.handlers = [h for h in self.handlers if h != handler]
+
+    async def send_message(self, chat, text):
+        sent = SimpleNamespace(id=len(self.history) + 1, message=text)
+        self.history.append(sent)
+        return sent
+
+    async def get_messages(self, chat, limit):
+        return list(reversed(self.history))[:limit]
+
+
+def test_no_reply_raises():
+    async def run():
+        collector = ReplyCollector(SilentClient(), "bot", timeout=0.05, settle=0.01)
+        await collector.request("/raw 770000000001")
+
+    with pytest.raises(NoReplyError):
+        asyncio.run(run())
+
+
+def test_late_reply_is_returned():
+    client = SilentClient()
+
+    async def run():
+        collector = ReplyCollector(client, "bot", timeout=0.05, settle=0.01)
+        # Ответ есть в чате, но событие о нём не пришло
+        original = client.send_message
+
+        async def send_message(chat, text):
+            sent = await original(chat, text)
+            client.history.append(SimpleNamespace(id=sent.id + 1, message="ничего не найдено"))
+            return sent
+
+        client.send_message = send_message
+        return await collector.request("/raw 770000000001")
+
+    assert [m.message for m in asyncio.run(run())] == ["ничего не найдено"]
+
+
+def test_drop_collector_releases_client(monkeypatch):
+    monkeypatch.setattr(bot_replies, "_collectors", {})
+    client = SilentClient()
+    collector = get_collector(client, "bot")
+    assert get_collector(client, "bot") is collector
+    assert len(client.handlers) == 2
+
+    drop_collector(client)
+    assert client.handlers == []
+    assert bot_replies._collectors == {}
@@ -0,0 +1,34 @@
+from src.html_report import get_phone_numbers_and_birthdate_from_html
+
+
+def _row(label, value):
+    return f'<div class="row"><div class="row_left">{label}</div><div class="row_right">{value}</div></div>'
+
+
+def _parse(html):
+    result = get_phone_numbers_and_birthdate_from_html("Иванов Иван Иванович", html.encode("utf-8"))
+    return sorted(result["phones"]), sorted(result["emails"]), result["birthday"]
+
+
+def test_closed_card():
+    html = (
+        '<html><body><div class="card">'
+        + _row("ФИО", "Иванов Иван Иванович")
+        + _row("Телефон", "+79001234567, +79007654321")
+        + _row("Email", "ivanov@mail.ru")
+        + _row("Дата рождения", "01.02.1980")
+        + "</div>"
+        + '<div class="card">' + _row("ФИО", "Петров Пётр") + _row("Телефон", "+79000000000") + "</div>"
+        + "</body></html>"
+    )
+    assert _parse(html) == (["+79001234567", "+79007654321"], ["ivanov@mail.ru"], "01.02.1980")
+
+
+def test_truncated_report_keeps_last_card():
+    # Отчёт оборван внутри последней карточки: строки, которые успели прийти, разбираются
+    html = (
+        '<div class="card">' + _row("ФИО", "Петров Пётр") + _row("Телефон", "+79000000000") + "</div>"
+        + '<div class="card">' + _row("ФИО", "Иванов Иван Иванович") + _row("Телефон", "+79001234567")
+        + '<div class="row"><div class="row_left">Email</div><div class="row_right">ivanov@mail.ru'
+    )
+    assert _parse(html) == (["+79001234567"], ["ivanov@mail.ru"], None)
@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+
+from src import google_sheets
+from src.bot_replies import NoReplyError
+from src.google_sheets import BotLookupError, LookupResult, _process_queue, lookup_row
+from src.pending import RowTask
+from src.result_cache import get_cache
+
+
+class FakeWriter:
+    def __init__(self):
+        self.rows = {}
+
+    async def add_many(self, rows, phones, emails):
+        for row in rows:
+            self.rows[row] = (phones, emails)
+
+
+def _fail_with(error):
+    async def lookup(client, chat, fio, inn):
+        raise error
+    return lookup
+
+
+def _queue(*tasks):
+    queue = asyncio.Queue()
+    for task in tasks:
+        queue.put_nowait(task)
+    return queue
+
+
+@pytest.mark.parametrize(
+    "error", [BotLookupError("Неизвестная ошибка: boom"), ConnectionError("нет сети"), NoReplyError("нет ответа")]
+)
+def test_failed_lookup_is_not_cached(monkeypatch, error):
+    monkeypatch.setattr(google_sheets, "get_phone_numbers_raw_inn", _fail_with(error))
+
+    with pytest.raises(type(error)):
+        asyncio.run(lookup_row(None, None, "Иванов Иван", "770000000001"))
+    assert get_cache().get_inn("770000000001") is None
+
+
+def test_lookup_error_writes_error(monkeypatch):
+    monkeypatch.setattr(google_sheets, "get_phone_numbers_raw_inn", _fail_with(BotLookupError("boom")))
+    writer = FakeWriter()
+    queue = _queue(RowTask(2, "Иванов Иван", "770000000001", (5,)))
+
+    assert asyncio.run(_process_queue(writer, queue, None, None, None, None)) is None
+    assert writer.rows == {2: ("ERROR", "ERROR"), 5: ("ERROR", "ERROR")}
+    assert queue.empty()
+
+
+def test_fio_dr_error_keeps_raw_result(monkeypatch):
+    async def raw_lookup(client, chat, fio, inn):
+        return {"phones": ["79001234567"], "emails": ["a@b.ru"], "birthday": "01.02.1980"}
+
+    monkeypatch.setattr(google_sheets, "get_phone_numbers_raw_inn", raw_lookup)
+    monkeypatch.setattr(google_sheets, "get_phone_numbers_fio_dr", _fail_with(BotLookupError("boom")))
+    monkeypatch.setattr(google_sheets.get_planner(), "should_query", lambda phones: True)
+    writer = FakeWriter()
+    queue = _queue(RowTask(2, "Иванов Иван", "770000000001"))
+
+    assert asyncio.run(_process_queue(writer, queue, None, None, None, None)) is None
+    assert writer.rows == {2: ("79001234567", "a@b.ru")}
+    assert get_cache().get_fio_dr("Иванов Иван", "01.02.1980") is None
+
+
+def test_connection_error_requeues_row(monkeypatch, workdir):
+    (workdir / "src" / "sessions.json").write_text('{"s1": [1, "hash"]}', encoding="utf-8")
+    monkeypatch.setattr(google_sheets, "get_phone_numbers_raw_inn", _fail_with(ConnectionError("нет сети")))
+    writer = FakeWriter()
+    task = RowTask(2, "Иванов Иван", "770000000001")
+    queue = _queue(task)
+
+    assert asyncio.run(_process_queue(writer, queue, None, None, None, "s1")) == "Нет соединения с Telegram"
+    assert writer.rows == {}
+    assert queue.get_nowait() == task
+
+
+def test_no_reply_leaves_row_unwritten(monkeypatch):
+    monkeypatch.setattr(google_sheets, "get_phone_numbers_raw_inn", _fail_with(NoReplyError("нет ответа")))
+    writer = FakeWriter()
+    queue = _queue(RowTask(2, "Иванов Иван", "770000000001"), RowTask(3, "Петров Пётр", "770000000002"))
+
+    assert asyncio.run(_process_queue(writer, queue, None, None, None, None)) is None
+    assert writer.rows == {}
+    assert queue.empty()
+
+
+def test_found_result_is_cached(monkeypatch):
+    async def lookup(client, chat, fio, inn):
+        return {"phones": ["79001234567"], "emails": ["a@b.ru"], "birthday": None}
+
+    monkeypatch.setattr(google_sheets, "get_phone_numbers_raw_inn", lookup)
+
+    result = asyncio.run(lookup_row(None, None, "Иванов Иван", "770000000001"))
+    assert result == LookupResult("79001234567", "a@b.ru", None)
+    assert get_cache().get_inn("770000000001")["phones"] == ["79001234567"]
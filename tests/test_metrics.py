@@ -0,0 +1,43 @@
+import time
+
+from src import metrics
+from src.metrics import PROCESSED, LogFollower, SummaryAggregator, record_event
+
+
+def _old_events(count):
+    conn = metrics._connect()
+    old = time.time() - (metrics.SUMMARY_DAYS + 2) * 24 * 60 * 60
+    conn.executemany(
+        "INSERT INTO events (ts, day, kind, session, row) VALUES (?, ?, ?, ?, ?)",
+        [(old, "2000-01-01", PROCESSED, "s1", row) for row in range(count)],
+    )
+    conn.commit()
+    conn.close()
+
+
+def test_old_events_are_not_reread():
+    _old_events(50)
+    aggregator = SummaryAggregator()
+    assert aggregator.poll() == 0
+
+    record_event(PROCESSED, "s1", 2, "770000000001", "Иванов Иван")
+    assert aggregator.poll() == 1
+
+
+def test_window_starts_at_first_recent_event():
+    _old_events(5)
+    record_event(PROCESSED, "s1", 2, "770000000001", "Иванов Иван")
+    assert SummaryAggregator().poll() == 1
+
+
+def test_log_follower_continues_after_tail(workdir):
+    path = workdir / "test.log"
+    path.write_bytes(b"".join(f"line {i}\n".encode() for i in range(10)) + b"line 10 part")
+
+    follower = LogFollower(str(path), from_end=False)
+    assert follower.tail(3) == ["line 7\n", "line 8\n", "line 9\n"]
+
+    with open(path, "ab") as f:
+        f.write(b"ial\nline 11\n")
+    assert follower.read_new() == ["line 10 partial\n", "line 11\n"]
+    assert follower.read_new() == []
@@ -0,0 +1,65 @@
+import asyncio
+
+from gspread.utils import a1_range_to_grid_range
+
+from src.pending import PendingIndex
+
+FIO_COL, INN_COL, PHONE_COL, EMAIL_COL = 1, 2, 3, 4
+
+
+class FakeSheet:
+    """Лист в памяти с async get, как у AsyncWorksheet; строка 1 — заголовок."""
+
+    def __init__(self, rows):
+        self.rows = [["ФИО", "ИНН", "Телефон", "Email"]] + rows
+        self.gets = []
+
+    @property
+    def row_count(self):
+        return len(self.rows) + 10
+
+    async def get(self, range_name):
+        self.gets.append(range_name)
+        grid = a1_range_to_grid_range(range_name)
+        out = [row[grid["startColumnIndex"]:grid["endColumnIndex"]] for row in self.rows[grid["startRowIndex"]:grid["endRowIndex"]]]
+        while out and not out[-1]:
+            out.pop()
+        return out
+
+
+def _index():
+    return PendingIndex(FIO_COL, INN_COL, PHONE_COL, EMAIL_COL)
+
+
+def test_new_rows_are_read_incrementally():
+    sheet = FakeSheet([["Иванов", "111", "", ""], ["Петров", "222", "7900", "a@b.ru"]])
+    index = _index()
+    asyncio.run(index.refresh(sheet))
+    assert index.rows == {2: ("Иванов", "111")}
+
+    sheet.rows.append(["Сидоров", "333", "", ""])
+    asyncio.run(index.refresh(sheet))
+    assert index.rows == {2: ("Иванов", "111"), 4: ("Сидоров", "333")}
+    # Полного прохода не было: столбец ИНН до last_row и строки после него
+    assert sheet.gets[1:] == ["B2:B3", "A4:D14"]
+
+
+def test_sorted_sheet_rebuilds_index():
+    sheet = FakeSheet([["Иванов", "111", "", ""], ["Петров", "222", "7900", "a@b.ru"]])
+    index = _index()
+    asyncio.run(index.refresh(sheet))
+
+    sheet.rows[1:] = reversed(sheet.rows[1:])
+    asyncio.run(index.refresh(sheet))
+    assert index.rows == {3: ("Иванов", "111")}
+
+
+def test_deleted_row_rebuilds_index():
+    sheet = FakeSheet([["Иванов", "111", "", ""], ["Петров", "222", "", ""], ["Сидоров", "333", "", ""]])
+    index = _index()
+    asyncio.run(index.refresh(sheet))
+
+    del sheet.rows[2]
+    asyncio.run(index.refresh(sheet))
+    assert index.rows == {2: ("Иванов", "111"), 3: ("Сидоров", "333")}
+    assert index.last_row == 3
@@ -0,0 +1,45 @@
+import asyncio
+
+from types import SimpleNamespace
+
+from telethon.tl.types import MessageMediaDocument
+
+from src import google_sheets
+
+CLIENT = SimpleNamespace(session=SimpleNamespace(filename=None))
+
+
+def _reply(monkeypatch, *messages):
+    async def ask_bot(client, chat, text, kind):
+        return list(messages)
+
+    async def parse_report_media(message, fio):
+        return {"phones": ["+79001234567"], "emails": ["ivanov@mail.ru"], "birthday": "01.02.1980"}
+
+    monkeypatch.setattr(google_sheets, "_ask_bot", ask_bot)
+    monkeypatch.setattr(google_sheets, "_parse_report_media", parse_report_media)
+
+
+def _report(message_id):
+    return SimpleNamespace(id=message_id, message="", media=MessageMediaDocument())
+
+
+def _text(message_id, text):
+    return SimpleNamespace(id=message_id, message=text, media=None)
+
+
+def test_report_before_not_found_is_parsed(monkeypatch):
+    _reply(monkeypatch, _report(2), _text(3, "По второму источнику ничего не найдено"))
+
+    data = asyncio.run(google_sheets.get_phone_numbers_raw_inn(CLIENT, "bot", "Иванов Иван", "770000000001"))
+    assert data == {"phones": ["79001234567"], "emails": ["ivanov@mail.ru"], "birthday": "01.02.1980"}
+
+    phones = asyncio.run(google_sheets.get_phone_numbers_fio_dr(CLIENT, "bot", "Иванов Иван", "01.02.1980"))
+    assert phones == ["79001234567"]
+
+
+def test_report_after_not_found_is_skipped(monkeypatch):
+    _reply(monkeypatch, _text(2, "ничего не найдено"), _report(3))
+
+    data = asyncio.run(google_sheets.get_phone_numbers_raw_inn(CLIENT, "bot", "Иванов Иван", "770000000001"))
+    assert data == {"phones": [], "emails": [], "birthday": None}
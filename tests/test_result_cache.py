@@ -0,0 +1,25 @@
+from src.result_cache import get_cache
+
+
+def _expire(seconds):
+    get_cache().conn.execute("UPDATE results SET created_at = created_at - ?", (seconds,))
+
+
+def test_empty_fio_dr_answer_uses_empty_ttl():
+    cache = get_cache()
+    cache.put_fio_dr("Иванов Иван", "01.02.1980", [])
+    cache.put_fio_dr("Петров Пётр", "01.02.1980", ["79001234567"])
+
+    _expire(cache.empty_ttl + 1)
+    assert cache.get_fio_dr("Иванов Иван", "01.02.1980") is None
+    assert cache.get_fio_dr("Петров Пётр", "01.02.1980") == ["79001234567"]
+
+
+def test_empty_inn_answer_uses_empty_ttl():
+    cache = get_cache()
+    cache.put_inn("770000000001", {"phones": [], "emails": [], "birthday": None})
+    cache.put_inn("770000000002", {"phones": [], "emails": [], "birthday": "01.02.1980"})
+
+    _expire(cache.empty_ttl + 1)
+    assert cache.get_inn("770000000001") is None
+    assert cache.get_inn("770000000002")["birthday"] == "01.02.1980"
@@ -0,0 +1,14 @@
+from src.result_store import get_result_store
+
+
+def test_empty_inn_is_not_a_filter():
+    store = get_result_store()
+    store.add("770000000001", "Иванов Иван", "79001234567", "a@b.ru")
+    store.add("770000000002", "Петров Пётр", "79007654321", "email не найден")
+
+    total, items = store.find(inn="", phone="+7 900 123-45-67")
+    assert total == 1
+    assert items[0]["inn"] == "770000000001"
+
+    total, _ = store.find(inn="770000000002", phone="")
+    assert total == 1
@@ -0,0 +1,68 @@
+import json
+import os
+import stat
+
+from src import scheduler as scheduler_module
+from src.instrumentation import QUOTA_REMAINING
+from src.scheduler import QuotaScheduler
+
+
+def _write_sessions(workdir, sessions):
+    (workdir / "src" / "sessions.json").write_text(json.dumps(sessions), encoding="utf-8")
+
+
+def _read_sessions(workdir):
+    return json.loads((workdir / "src" / "sessions.json").read_text(encoding="utf-8"))
+
+
+def test_requests_are_saved_on_flush(workdir):
+    _write_sessions(workdir, {"s1": [1, "hash", 0, 10]})
+    scheduler = QuotaScheduler()
+    scheduler.flush()
+    saved = _read_sessions(workdir)
+
+    scheduler.record_request("s1")
+    scheduler.record_request("s1")
+    assert _read_sessions(workdir) == saved
+    assert scheduler.remaining("s1") == 8
+
+    scheduler.flush()
+    assert _read_sessions(workdir)["s1"][:4] == [1, "hash", 2, 10]
+
+
+def test_save_after_interval(workdir, monkeypatch):
+    _write_sessions(workdir, {"s1": [1, "hash", 0, 10]})
+    scheduler = QuotaScheduler()
+    monkeypatch.setattr(scheduler_module, "SAVE_INTERVAL", 0)
+
+    scheduler.record_request("s1")
+    assert _read_sessions(workdir)["s1"][2] == 1
+
+
+def test_reload_keeps_unsaved_requests(workdir):
+    _write_sessions(workdir, {"s1": [1, "hash", 0, 10]})
+    scheduler = QuotaScheduler()
+    scheduler.record_request("s1")
+
+    scheduler.reload()
+    assert scheduler.used("s1") == 1
+
+
+def test_sessions_file_is_replaced_atomically(workdir):
+    _write_sessions(workdir, {"s1": [1, "hash", 0, 10]})
+    scheduler = QuotaScheduler()
+    scheduler.mark_exhausted("s1")
+
+    path = workdir / "src" / "sessions.json"
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    assert not os.path.exists(f"{path}.tmp")
+    assert _read_sessions(workdir)["s1"][2] == 10
+
+
+def test_quota_gauge_is_set_on_load(workdir, monkeypatch):
+    monkeypatch.setattr(QUOTA_REMAINING, "_values", {})
+    _write_sessions(workdir, {"s1": [1, "hash", 3, 10], "s2": [2, "hash", 0, 5]})
+    QuotaScheduler()
+
+    series = {s["labels"]["session"]: s["value"] for s in QUOTA_REMAINING.snapshot()["series"]}
+    assert series == {"s1": 7, "s2": 5}
@@ -0,0 +1,18 @@
+import os
+
+from src.storage import load_json_state, save_json_atomic
+
+
+def test_save_and_load(workdir):
+    path = str(workdir / "state.json")
+    save_json_atomic(path, {"s1": {"rate": 1.5}})
+    assert load_json_state(path) == {"s1": {"rate": 1.5}}
+    assert not os.path.exists(f"{path}.tmp")
+
+
+def test_missing_or_broken_file_gives_default(workdir):
+    path = workdir / "state.json"
+    assert load_json_state(str(path), {}) == {}
+    path.write_text("{", encoding="utf-8")
+    assert load_json_state(str(path), {}, "повреждён") == {}
+    assert load_json_state(str(path)) is None